@@ -0,0 +1,167 @@
+import os
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List
+
+# ===== ALLOCATION PROFILING (opt-in) =====
+# With MEALMATE_ALLOC_PROFILING=1, requests wrapped in profile_request() record
+# per-stage net allocated bytes/blocks, peak memory and the top allocation sites
+# (tracemalloc snapshot diffs). Code marks stages with profile_stage(), which is
+# a no-op unless a profiled request is active on the current thread.
+#
+# tracemalloc's peak counter is process-wide: run single-threaded (or under the
+# replay tool) when precise per-request numbers matter.
+
+_current = threading.local()
+
+
+class StageStats:
+    """Measurements for one stage of one request"""
+
+    __slots__ = ('path', 'net_bytes', 'net_blocks', 'peak_bytes', 'top_sites', 'start_bytes',
+                 'start_snapshot', 'child_peak')
+
+    def __init__(self, path: str, start_bytes: int, start_snapshot):
+        self.path = path
+        self.start_bytes = start_bytes
+        self.start_snapshot = start_snapshot
+        self.child_peak = 0
+        self.net_bytes = 0
+        self.net_blocks = 0
+        self.peak_bytes = 0
+        self.top_sites: List[Dict] = []
+
+    def to_dict(self) -> Dict:
+        return {"stage": self.path, "net_bytes": self.net_bytes, "net_blocks": self.net_blocks,
+                "peak_bytes": self.peak_bytes, "top_sites": self.top_sites}
+
+
+class RequestProfile:
+    """Stages recorded while handling a single request"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.stages: List[StageStats] = []
+        self.stack: List[StageStats] = []
+
+    def to_dict(self) -> Dict:
+        return {"request": self.label, "stages": [stage.to_dict() for stage in self.stages]}
+
+
+class AllocationProfiler:
+    """Collects per-request, per-stage allocation profiles and aggregates them"""
+
+    def __init__(self, enabled: bool = False, top_n: int = 10, history: int = 50, frames: int = 1):
+        self.enabled = enabled
+        self.top_n = top_n
+        self.frames = frames
+        self.recent = deque(maxlen=history)
+        self._totals: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                         tracemalloc.Filter(False, __file__)]
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(self._filters)
+
+    @contextmanager
+    def profile_request(self, label: str):
+        """Profile everything inside the block as one request (whole request = stage 'total')"""
+        if not self.enabled:
+            yield None
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+        request_profile = RequestProfile(label)
+        _current.profiler = self
+        _current.profile = request_profile
+        try:
+            with self.stage(request_profile, 'total'):
+                yield request_profile
+        finally:
+            _current.profile = None
+            self._record(request_profile)
+
+    @contextmanager
+    def stage(self, request_profile: RequestProfile, name: str):
+        parent = request_profile.stack[-1] if request_profile.stack else None
+        path = f"{parent.path}/{name}" if parent and parent.path != 'total' else name
+        start_snapshot = self._snapshot()
+        # Read the baseline after snapshotting so the snapshot itself isn't counted
+        stats = StageStats(path, tracemalloc.get_traced_memory()[0], start_snapshot)
+        request_profile.stack.append(stats)
+        tracemalloc.reset_peak()
+        try:
+            yield stats
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            end_snapshot = self._snapshot()
+            diffs = [diff for diff in end_snapshot.compare_to(stats.start_snapshot, 'lineno')
+                     if diff.size_diff > 0]
+            stats.net_bytes = current - stats.start_bytes
+            stats.net_blocks = sum(diff.count_diff for diff in diffs)
+            stats.peak_bytes = max(peak, stats.child_peak) - stats.start_bytes
+            stats.top_sites = [{"site": str(diff.traceback), "size_diff": diff.size_diff,
+                                "count_diff": diff.count_diff} for diff in diffs[:self.top_n]]
+            stats.start_snapshot = None
+            request_profile.stack.pop()
+            if parent is not None:
+                # reset_peak() above hid our peak from the parent; hand it back
+                parent.child_peak = max(parent.child_peak, peak, stats.child_peak)
+            request_profile.stages.append(stats)
+
+    def _record(self, request_profile: RequestProfile):
+        with self._lock:
+            self.recent.append(request_profile.to_dict())
+            for stage in request_profile.stages:
+                key = f"{request_profile.label} {stage.path}"
+                totals = self._totals.setdefault(key, {"count": 0, "net_bytes": 0, "net_blocks": 0,
+                                                       "max_peak_bytes": 0, "sites": {}})
+                totals["count"] += 1
+                totals["net_bytes"] += stage.net_bytes
+                totals["net_blocks"] += stage.net_blocks
+                totals["max_peak_bytes"] = max(totals["max_peak_bytes"], stage.peak_bytes)
+                for site in stage.top_sites:
+                    totals["sites"][site["site"]] = totals["sites"].get(site["site"], 0) + site["size_diff"]
+
+    def report(self) -> Dict:
+        """Aggregated per-stage stats plus the most recent request profiles"""
+        with self._lock:
+            stages = {}
+            for key, totals in self._totals.items():
+                top_sites = sorted(totals["sites"].items(), key=lambda item: item[1], reverse=True)[:self.top_n]
+                stages[key] = {
+                    "requests": totals["count"],
+                    "avg_net_bytes": totals["net_bytes"] // totals["count"],
+                    "avg_net_blocks": totals["net_blocks"] // totals["count"],
+                    "max_peak_bytes": totals["max_peak_bytes"],
+                    "top_sites": [{"site": site, "size_diff": size} for site, size in top_sites]
+                }
+            return {"enabled": self.enabled, "stages": stages, "recent": list(self.recent)}
+
+    def reset(self):
+        with self._lock:
+            self.recent.clear()
+            self._totals.clear()
+
+
+@contextmanager
+def profile_stage(name: str):
+    """Mark a stage of the current profiled request (no-op when profiling is off)"""
+    request_profile = getattr(_current, 'profile', None)
+    if request_profile is None:
+        yield
+        return
+    with _current.profiler.stage(request_profile, name):
+        yield
+
+
+def profiler_from_env() -> AllocationProfiler:
+    """Configure from MEALMATE_ALLOC_PROFILING (1/true) and MEALMATE_ALLOC_TOP_N"""
+    return AllocationProfiler(
+        enabled=os.getenv('MEALMATE_ALLOC_PROFILING', '').lower() in ('1', 'true', 'yes'),
+        top_n=int(os.getenv('MEALMATE_ALLOC_TOP_N', '10'))
+    )
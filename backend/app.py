@@ -1,9 +1,31 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from startup import STARTUP_REPORT, load_startup_state, install_startup_state
+
+with STARTUP_REPORT.phase("import_flask"):
+    from flask import Flask, request, jsonify, g
+    from flask_cors import CORS
+import hmac
 import json
 import os
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from chatgpt_service import get_meal_recommendation_from_chatgpt
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; counters are then only safe with a single worker
+    fcntl = None
+with STARTUP_REPORT.phase("import_services"):
+    from chatgpt_service import (get_meal_recommendation_from_chatgpt, get_last_response_source,
+                                 RESPONSE_SOURCE_CACHE)
+    from meal_catalog import get_cached_catalog
+    from traffic_capture import recorded_headers, recorder_from_env, redact_body
+    from popularity import (CATEGORY_TO_RATING, MealRatingCounters, PopularityTable,
+                            get_popularity_table, install_popularity_table)
+    from preference_history import cap_history, folded_ratings, forget_folded, normalize_user_preferences
+    from chatgpt_service import meal_name_features
+    from http_cache import BodyCache, CachedBody, StaticAssetCache, asset_version, cached_response
+    from collaborative import DEFAULT_CF_MODEL_DIR, install_cf_model, load_cf_model
+    from alloc_profiler import profile_stage, profiler_from_env
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend-backend communication
@@ -12,6 +34,22 @@ CORS(app)  # Enable CORS for frontend-backend communication
 USERS_FILE = '../data/users.json'
 MEALS_FILE = '../data/meals.json'
 PREFERENCES_FILE = '../data/preferences.json'
+MEAL_RATINGS_FILE = '../data/meal_ratings.json'
+FRONTEND_DIR = '../frontend'
+# Collaborative filtering factors written by `python train_cf.py` (skipped if absent)
+CF_MODEL_DIR = os.getenv('MEALMATE_CF_MODEL_DIR', DEFAULT_CF_MODEL_DIR)
+# Optional prebuilt startup snapshot (see `python startup.py build-snapshot`)
+STARTUP_SNAPSHOT_FILE = os.getenv('MEALMATE_STARTUP_SNAPSHOT')
+
+# ===== HTTP CACHING =====
+SERVE_FRONTEND = os.getenv('MEALMATE_SERVE_FRONTEND', '').lower() in ('1', 'true', 'yes')
+STATIC_MAX_AGE = int(os.getenv('MEALMATE_STATIC_MAX_AGE', '31536000'))  # Frontend assets requested with a current ?v=
+MENU_CACHE_CONTROL = 'public, max-age=60'
+PREFERENCES_CACHE_CONTROL = 'private, no-cache'
+PREFERENCE_BODY_CACHE_SIZE = int(os.getenv('MEALMATE_PREFERENCE_CACHE_SIZE', '1024'))  # Users kept serialized
+# Bookkeeping stored with a user's preferences that is never sent to clients
+INTERNAL_PREFERENCE_KEYS = ('revision', 'summary')
+ADMIN_TOKEN = os.getenv('MEALMATE_ADMIN_TOKEN')  # Unset disables the admin endpoints
 
 # ===== UTILITY FUNCTIONS =====
 def load_json_file(filepath):
@@ -37,18 +75,153 @@ def get_user_preferences(user_id):
     preferences = load_json_file(PREFERENCES_FILE)
     user_prefs = preferences.get(str(user_id), {"liked": [], "disliked": [], "neutral": []})
     
-    # Ensure all categories exist for backward compatibility
-    if "neutral" not in user_prefs:
-        user_prefs["neutral"] = []
-    
-    return user_prefs
+    # Ensure all categories exist and legacy entries (bare names, no timestamp) are upgraded
+    return normalize_user_preferences(user_prefs)
 
 def save_user_preferences(user_id, preferences):
-    """Save user preferences"""
+    """Save user preferences, bumping the user's revision (used as the ETag)"""
     all_preferences = load_json_file(PREFERENCES_FILE)
+    previous = all_preferences.get(str(user_id), {})
+    preferences['revision'] = previous.get('revision', 0) + 1
     all_preferences[str(user_id)] = preferences
     save_json_file(PREFERENCES_FILE, all_preferences)
 
+# Parsed preferences file for read endpoints, re-read only when the file changes
+_preferences_snapshot = {"key": None, "data": {}}
+# user_id -> (revision, serialized response body), least recently used evicted first
+_preference_bodies = BodyCache(PREFERENCE_BODY_CACHE_SIZE)
+
+def load_preferences_snapshot():
+    """Read-only view of the preferences file, cached until it changes on disk"""
+    try:
+        stat = os.stat(PREFERENCES_FILE)
+        key = (PREFERENCES_FILE, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return {}
+    if _preferences_snapshot["key"] != key:
+        data = load_json_file(PREFERENCES_FILE)
+        _preferences_snapshot["data"] = data if isinstance(data, dict) else {}
+        _preferences_snapshot["key"] = key
+    return _preferences_snapshot["data"]
+
+def get_preferences_body(user_id):
+    """Return (revision, CachedBody) for a user's preferences response"""
+    user_prefs = load_preferences_snapshot().get(str(user_id))
+    revision = (user_prefs or {}).get('revision', 0)
+    cached = _preference_bodies.get(str(user_id), revision)
+    if cached is not None:
+        return revision, cached
+    
+    preferences = normalize_user_preferences(json.loads(json.dumps(
+        user_prefs or {"liked": [], "disliked": [], "neutral": []})))
+    public_preferences = {key: value for key, value in preferences.items() if key not in INTERNAL_PREFERENCE_KEYS}
+    body = CachedBody(app.json.dumps({"success": True, "preferences": public_preferences}).encode())
+    _preference_bodies.put(str(user_id), revision, body)
+    return revision, body
+
+# catalog version -> serialized /api/menu body
+_menu_bodies = {}
+
+def get_menu_body(catalog):
+    body = _menu_bodies.get(catalog.version)
+    if body is None:
+        _menu_bodies.clear()  # Only the current catalog version is worth keeping
+        body = CachedBody(app.json.dumps({"success": True, "meals": catalog.to_dicts()}).encode())
+        _menu_bodies[catalog.version] = body
+    return body
+
+def find_meal_rating(preferences, meal_name):
+    """Return the user's current rating of a meal ('like', 'dislike', 'neutral') or None"""
+    for category, rating in CATEGORY_TO_RATING.items():
+        for meal in preferences.get(category, []):
+            if (meal.get('name', meal) if isinstance(meal, dict) else meal) == meal_name:
+                return rating
+    # Older ratings folded into the summary
+    return CATEGORY_TO_RATING.get(folded_ratings(preferences).get(meal_name))
+
+@contextmanager
+def meal_ratings_lock():
+    """Exclusive lock on the counters file, shared by every worker process and thread"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(MEAL_RATINGS_FILE), exist_ok=True)
+    with open(MEAL_RATINGS_FILE + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# (mtime_ns, size) of the counters file as last adopted by this worker's popularity table
+_meal_ratings_snapshot = {"key": None}
+
+def meal_ratings_file_key():
+    try:
+        stat = os.stat(MEAL_RATINGS_FILE)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def load_meal_rating_counters():
+    """Load global per-meal rating counters, rebuilding them from preferences if missing"""
+    with meal_ratings_lock():
+        if os.path.exists(MEAL_RATINGS_FILE):
+            _meal_ratings_snapshot["key"] = meal_ratings_file_key()
+            return MealRatingCounters(load_json_file(MEAL_RATINGS_FILE))
+    return MealRatingCounters.from_preferences(load_json_file(PREFERENCES_FILE))
+
+def refresh_popularity_table():
+    """Adopt ratings other workers wrote to the counters file since this worker last looked"""
+    key = meal_ratings_file_key()
+    if key is None or key == _meal_ratings_snapshot["key"]:
+        return
+    with meal_ratings_lock():
+        key = meal_ratings_file_key()
+        counters = MealRatingCounters(load_json_file(MEAL_RATINGS_FILE))
+    get_popularity_table().sync_all(counters)
+    _meal_ratings_snapshot["key"] = key
+
+def record_meal_ratings(changes):
+    """Apply (meal_name, old_rating, new_rating) events to the shared counters file and this worker's table"""
+    with meal_ratings_lock():
+        # Merge into what is on disk, not this worker's copy, so workers don't overwrite each other
+        if os.path.exists(MEAL_RATINGS_FILE):
+            counters = MealRatingCounters(load_json_file(MEAL_RATINGS_FILE))
+            for meal_name, old_rating, new_rating in changes:
+                counters.apply(meal_name, old_rating, new_rating)
+        else:
+            # Preferences are saved before this runs, so the rebuild already includes these events
+            counters = MealRatingCounters.from_preferences(load_json_file(PREFERENCES_FILE))
+        save_json_file(MEAL_RATINGS_FILE, counters.to_dict())
+    # Adopt the merged counts, which also carry other workers' ratings of these meals
+    get_popularity_table().sync_counts({meal_name: counters.get(meal_name) for meal_name, _, _ in changes})
+
+# ===== TRAFFIC CAPTURE =====
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.response_source = None
+
+@app.after_request
+def capture_request(response):
+    """Append the request to the capture file when traffic capture is enabled"""
+    recorder = app.config.get('TRAFFIC_RECORDER')
+    if recorder and recorder.enabled and request.path.startswith('/api/') and recorder.should_record():
+        started = g.get('request_started', time.perf_counter())
+        recorder.record({
+            "ts": time.time(),
+            "method": request.method,
+            "endpoint": request.path,
+            "query": request.query_string.decode('utf-8', 'replace'),
+            "headers": recorded_headers(request.headers),
+            "body": redact_body(request.get_json(silent=True)),
+            "status": response.status_code,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "source": g.get('response_source')
+        })
+    return response
+
 # ===== API ENDPOINTS =====
 
 @app.route('/api/register', methods=['POST'])
@@ -130,18 +303,25 @@ def get_recommendation():
         if not user_id or not budget:
             return jsonify({"success": False, "error": "User ID and budget are required"}), 400
         
-        # Get user preferences
-        preferences = get_user_preferences(user_id)
-        
-        # Get available meals
-        available_meals = load_json_file(MEALS_FILE)
+        # Other workers' ratings reach this worker's popularity ranking here
+        refresh_popularity_table()
         
-        # Call ChatGPT service to get recommendation
-        recommendation = get_meal_recommendation_from_chatgpt(
-            budget=budget,
-            preferences=preferences,
-            available_meals=available_meals
-        )
+        with app.config['ALLOCATION_PROFILER'].profile_request('/api/get-recommendation'):
+            # Get user preferences
+            with profile_stage('load_preferences'):
+                preferences = get_user_preferences(user_id)
+            
+            # Get available meals (interned catalog, reloaded only when meals.json changes)
+            with profile_stage('load_catalog'):
+                available_meals = get_cached_catalog(MEALS_FILE)
+            
+            # Call ChatGPT service to get recommendation
+            recommendation = get_meal_recommendation_from_chatgpt(
+                budget=budget,
+                preferences=preferences,
+                available_meals=available_meals
+            )
+        g.response_source = get_last_response_source()
         
         if recommendation:
             return jsonify({"success": True, "data": recommendation}), 200
@@ -166,14 +346,16 @@ def rate_meal():
         
         # Get current preferences
         preferences = get_user_preferences(user_id)
+        previous_rating = find_meal_rating(preferences, meal_name)
         
         # Create a meal object if we only have the name
-        meal_obj = {"name": meal_name, "price": 0}  # Default price, will be updated by frontend
+        meal_obj = {"name": meal_name, "price": 0, "rated_at": time.time()}  # Default price, will be updated by frontend
         
         # Update preferences - remove from all categories first
         for category in ['liked', 'disliked', 'neutral']:
             preferences[category] = [meal for meal in preferences[category] 
                                    if (meal.get('name', meal) if isinstance(meal, dict) else meal) != meal_name]
+        forget_folded(preferences, meal_name, meal_name_features)
         
         # Add to appropriate category based on rating
         if rating == 'like':
@@ -183,26 +365,48 @@ def rate_meal():
         else:  # neutral
             preferences['neutral'].append(meal_obj)
         
+        # Keep raw history bounded: the oldest ratings fold into decayed summary counters
+        cap_history(preferences, meal_name_features)
+        
         # Save updated preferences
         save_user_preferences(user_id, preferences)
+        record_meal_ratings([(meal_name, previous_rating, rating)])
         
         return jsonify({"success": True, "message": "Rating saved successfully"}), 200
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/get-user-preferences', methods=['POST'])
+@app.route('/api/get-user-preferences', methods=['GET', 'POST'])
 def get_preferences():
-    """Get user preferences"""
+    """Get user preferences (GET ?userId=... supports If-None-Match)"""
     try:
-        data = request.json
-        user_id = data.get('userId')
+        if request.method == 'GET':
+            user_id = request.args.get('userId')
+        else:
+            user_id = request.json.get('userId')
         
         if not user_id:
             return jsonify({"success": False, "error": "User ID is required"}), 400
         
-        preferences = get_user_preferences(user_id)
-        return jsonify({"success": True, "preferences": preferences}), 200
+        revision, body = get_preferences_body(user_id)
+        response = cached_response(body, f'"prefs-{user_id}-{revision}"', PREFERENCES_CACHE_CONTROL)
+        if response.status_code == 304:
+            g.response_source = RESPONSE_SOURCE_CACHE
+        return response
+        
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/menu', methods=['GET'])
+def get_menu():
+    """Get the full menu (ETag follows the catalog version)"""
+    try:
+        catalog = get_cached_catalog(MEALS_FILE)
+        response = cached_response(get_menu_body(catalog), f'"menu-{catalog.version}"', MENU_CACHE_CONTROL)
+        if response.status_code == 304:
+            g.response_source = RESPONSE_SOURCE_CACHE
+        return response
         
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -217,9 +421,18 @@ def clear_preferences():
         if not user_id:
             return jsonify({"success": False, "error": "User ID is required"}), 400
         
+        # Drop this user's ratings from the global counters
+        preferences = get_user_preferences(user_id)
+        changes = [(meal.get('name', '') if isinstance(meal, dict) else str(meal), rating, None)
+                   for category, rating in CATEGORY_TO_RATING.items()
+                   for meal in preferences.get(category, [])]
+        changes += [(meal_name, CATEGORY_TO_RATING[category], None)
+                    for meal_name, category in folded_ratings(preferences).items()]
+        
         # Clear all preferences
         empty_preferences = {"liked": [], "disliked": [], "neutral": []}
         save_user_preferences(user_id, empty_preferences)
+        record_meal_ratings(changes)
         
         return jsonify({"success": True, "message": "All preferences cleared"}), 200
         
@@ -239,14 +452,17 @@ def remove_meal():
         
         # Get current preferences
         preferences = get_user_preferences(user_id)
+        previous_rating = find_meal_rating(preferences, meal_name)
         
         # Remove meal from all categories
         for category in ['liked', 'disliked', 'neutral']:
             preferences[category] = [meal for meal in preferences[category] 
                                    if (meal.get('name', meal) if isinstance(meal, dict) else meal) != meal_name]
+        forget_folded(preferences, meal_name, meal_name_features)
         
         # Save updated preferences
         save_user_preferences(user_id, preferences)
+        record_meal_ratings([(meal_name, previous_rating, None)])
         
         return jsonify({"success": True, "message": "Meal removed successfully"}), 200
         
@@ -258,11 +474,70 @@ def health_check():
     """Health check endpoint"""
     return jsonify({"status": "healthy", "message": "MealMate backend is running!"}), 200
 
+@app.route('/api/admin/allocations', methods=['GET', 'DELETE'])
+def allocation_report():
+    """Per-stage allocation profile of recent requests (DELETE resets it)"""
+    supplied = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_TOKEN or not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({"success": False, "error": "Forbidden"}), 403
+    
+    profiler = app.config['ALLOCATION_PROFILER']
+    if not profiler.enabled:
+        return jsonify({"success": False, "error": "Allocation profiling is disabled (set MEALMATE_ALLOC_PROFILING=1)"}), 404
+    
+    if request.method == 'DELETE':
+        profiler.reset()
+        return jsonify({"success": True, "message": "Allocation profile reset"}), 200
+    return jsonify({"success": True, "data": profiler.report()}), 200
+
+# ===== FRONTEND STATIC ASSETS (optional) =====
+frontend_assets = StaticAssetCache(FRONTEND_DIR)
+
+def serve_frontend_asset(asset_path='index.html'):
+    """Serve frontend/ files with ETags, gzip variants and long-lived cache headers for versioned assets"""
+    path = frontend_assets.resolve(asset_path)
+    if path is None:
+        return jsonify({"success": False, "error": "Not found"}), 404
+    if path.endswith('.html'):
+        # Pages are always revalidated; their asset links carry ?v=<content hash>
+        etag, body = frontend_assets.get_page(path)
+        return cached_response(body, etag, 'no-cache')
+    
+    etag, body = frontend_assets.get(path)
+    if request.args.get('v') == asset_version(etag):
+        cache_control = f'public, max-age={STATIC_MAX_AGE}, immutable'
+    else:
+        cache_control = 'no-cache'  # Unversioned (or outdated) URL: revalidate via the ETag
+    return cached_response(body, etag, cache_control)
+
+# ===== APP FACTORY =====
+def create_app(snapshot_file=STARTUP_SNAPSHOT_FILE):
+    """Build the meal catalog and keyword matchers once, before serving requests"""
+    state = load_startup_state(MEALS_FILE, snapshot_file)
+    with STARTUP_REPORT.phase("install_state"):
+        install_startup_state(state)
+    with STARTUP_REPORT.phase("load_popularity"):
+        install_popularity_table(PopularityTable(load_meal_rating_counters()))
+    with STARTUP_REPORT.phase("load_cf_model"):
+        install_cf_model(load_cf_model(CF_MODEL_DIR))
+    app.config['STARTUP_STATE'] = state
+    app.config['STARTUP_REPORT'] = STARTUP_REPORT
+    app.config['TRAFFIC_RECORDER'] = recorder_from_env()
+    app.config['ALLOCATION_PROFILER'] = profiler_from_env()
+    if SERVE_FRONTEND and 'serve_frontend_asset' not in app.view_functions:
+        app.add_url_rule('/', 'serve_frontend_asset', serve_frontend_asset)
+        app.add_url_rule('/<path:asset_path>', 'serve_frontend_asset', serve_frontend_asset)
+    return app
+
+create_app()
+
 # ===== RUN SERVER =====
 if __name__ == '__main__':
     print("🚀 Starting MealMate Backend Server...")
     print("📂 Data files will be stored in '../data/' directory")
     print("🌐 Frontend should connect to: http://localhost:3000/api")
     print("✨ New features: Neutral ratings, meal details, improved preferences")
+    print("⏱️  Startup report:")
+    print(STARTUP_REPORT.format())
     print("="*50)
     app.run(debug=True, host='0.0.0.0', port=3000)
\ No newline at end of file
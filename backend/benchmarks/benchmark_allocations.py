@@ -0,0 +1,103 @@
+"""
+Benchmark: memory allocated per recommendation
+
+Runs the full recommendation path (budget filter, scoring, prompt, stubbed
+LLM call, validation) against a synthetic menu for a user with a full,
+capped rating history, and measures with tracemalloc
+  - peak bytes allocated while producing one recommendation
+  - bytes still retained after it returns (should stay near zero)
+
+Exits non-zero if either exceeds its budget, so it can gate changes to the
+scoring path.
+
+Usage (from backend/): python benchmarks/benchmark_allocations.py [menu_size] [runs]
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # backend/ modules
+
+import chatgpt_service
+from benchmark_catalog import build_synthetic_menu
+from chatgpt_service import get_meal_recommendation_from_chatgpt, meal_name_features
+from meal_catalog import MealCatalog
+from preference_history import MAX_HISTORY_PER_CATEGORY, cap_history
+from replay_traffic import StubChatCompletion
+
+# Budgets for the default 2,000-meal menu (~1.5x measured); raise deliberately, not casually
+PEAK_BYTES_BUDGET = 270_000
+RETAINED_BYTES_BUDGET = 16_384
+
+BENCHMARK_BUDGET = 20.0
+
+
+def build_heavy_user(menu, now: float) -> Dict:
+    """A user who has rated well past the per-category cap, then had history folded into the summary"""
+    preferences = {"liked": [], "disliked": [], "neutral": []}
+    categories = ("liked", "liked", "disliked", "neutral")  # Mostly likes, like real users
+    for i, meal in enumerate(menu[:MAX_HISTORY_PER_CATEGORY * 6]):
+        preferences[categories[i % len(categories)]].append(
+            {"name": meal["name"], "price": meal["price"], "rated_at": now - i * 3600})
+    return cap_history(preferences, meal_name_features, now)
+
+
+def measure(catalog: MealCatalog, preferences: Dict, runs: int):
+    """(max peak bytes, mean retained bytes) over `runs` recommendations"""
+    peaks, retained = [], []
+    tracemalloc.start()
+    for _ in range(runs):
+        gc.collect()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        recommendation = get_meal_recommendation_from_chatgpt(BENCHMARK_BUDGET, preferences, catalog)
+        del recommendation
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        retained.append(current - before)
+    tracemalloc.stop()
+    return max(peaks), sum(retained) / len(retained)
+
+
+def run(size: int = 2_000, runs: int = 20) -> int:
+    stub = SimpleNamespace(ChatCompletion=StubChatCompletion())
+    chatgpt_service.get_openai_client = lambda: stub
+    now = time.time()
+    menu = build_synthetic_menu(size)
+    catalog = MealCatalog(menu)
+    preferences = build_heavy_user(menu, now)
+    print(f"📦 {size:,} meals, user with {sum(len(preferences[c]) for c in ('liked', 'disliked', 'neutral'))} "
+          f"recent ratings + summary")
+
+    # Warm up lazy caches (keyword matchers, name features) so they aren't billed to a request
+    for _ in range(3):
+        get_meal_recommendation_from_chatgpt(BENCHMARK_BUDGET, preferences, catalog)
+
+    peak, retained = measure(catalog, preferences, runs)
+    print(f"🧠 Peak per recommendation:     {peak / 1e3:8.1f} KB (budget {PEAK_BYTES_BUDGET / 1e3:.0f} KB)")
+    print(f"🧠 Retained per recommendation: {retained / 1e3:8.1f} KB (budget {RETAINED_BYTES_BUDGET / 1e3:.0f} KB)")
+
+    if size != 2_000:
+        print("ℹ️  Budgets are calibrated for the default menu size; not enforcing")
+        return 0
+    failed = False
+    if peak > PEAK_BYTES_BUDGET:
+        print("❌ Peak allocation over budget")
+        failed = True
+    if retained > RETAINED_BYTES_BUDGET:
+        print("❌ Retained allocation over budget (leak or unbounded cache on the request path?)")
+        failed = True
+    if not failed:
+        print("✅ Within allocation budgets")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000,
+                 int(sys.argv[2]) if len(sys.argv) > 2 else 20))
@@ -0,0 +1,185 @@
+"""
+Benchmark: raw meal dicts vs the interned MealCatalog
+
+Builds a synthetic menu (100k items by default), then compares
+  - memory held by the menu once loaded from meals.json: json.load into dicts vs
+    load_meal_catalog, the way the app loads it (tracemalloc, and resident set
+    size measured in a fresh process per representation; the catalog's RSS also
+    keeps the allocator arenas left over from parsing the file)
+  - per-meal normalization cost (what the scorer used to redo on every call)
+  - per-meal compatibility scoring time: the pre-catalog scorer on dicts
+    (legacy_scorer.py) vs the current scorer on catalog records
+
+Usage (from backend/): python benchmarks/benchmark_catalog.py [menu_size]
+"""
+
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # backend/ modules
+
+from meal_catalog import MealCatalog, load_meal_catalog
+from chatgpt_service import PreferenceProfile, calculate_meal_compatibility_score
+from legacy_scorer import calculate_meal_compatibility_score as legacy_calculate_meal_compatibility_score
+
+CUISINES = ['American', 'Italian', 'Mexican', 'Asian', 'Mediterranean', 'Indian', 'Thai', 'Greek']
+CATEGORIES = ['Salad', 'Pizza', 'Pasta', 'Sandwich', 'Bowl', 'Seafood', 'Curry', 'Burger']
+INGREDIENTS = ['Chicken Breast', 'Beef Patty', 'Salmon', 'Avocado', 'Quinoa', 'Rice', 'Cheese',
+               'Tomato', 'Lettuce', 'Pasta', 'Black Beans', 'Bell Peppers', 'Onion', 'Garlic',
+               'Herbs', 'Tofu', 'Mixed Vegetables', 'Feta Cheese', 'Pizza Dough', 'Basil']
+
+SAMPLE_PREFERENCES = {
+    "liked": ["Margherita Pizza", {"name": "Quinoa Buddha Bowl", "price": 0}],
+    "disliked": [{"name": "BBQ Pulled Pork Sandwich", "price": 0}],
+    "neutral": ["Greek Gyro Plate"]
+}
+
+
+def build_synthetic_menu(size: int, seed: int = 42) -> List[Dict]:
+    """Generate meals.json-shaped dicts"""
+    rng = random.Random(seed)
+    menu = []
+    for i in range(size):
+        cuisine = rng.choice(CUISINES)
+        category = rng.choice(CATEGORIES)
+        menu.append({
+            "id": i + 1,
+            "name": f"{cuisine} {category} #{i + 1}",
+            "description": f"House {category.lower()} prepared {cuisine.lower()} style",
+            "price": round(rng.uniform(6.0, 25.0), 2),
+            "cuisine_type": cuisine,
+            "ingredients": rng.sample(INGREDIENTS, rng.randint(3, 6)),
+            "category": category
+        })
+    return menu
+
+
+def measure_memory(build: Callable[[], object]) -> int:
+    """Bytes still allocated after build() returns (object kept alive)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return after - before
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size (/proc on Linux; elsewhere the peak from getrusage)"""
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+
+def load_menu(kind: str, path: str):
+    """Load the menu file as raw dicts or, like the app does, as a MealCatalog"""
+    if kind == 'catalog':
+        return load_meal_catalog(path)  # The parsed dicts are freed inside the loader
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def rss_child(kind: str, path: str) -> int:
+    """In a fresh process: RSS growth from loading one representation of the menu"""
+    gc.collect()
+    before = rss_bytes()
+    menu = load_menu(kind, path)
+    gc.collect()
+    after = rss_bytes()
+    del menu
+    return after - before
+
+
+def measure_rss(kind: str, path: str) -> Optional[int]:
+    """Run rss_child in a subprocess so freed memory of earlier loads can't skew it"""
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--rss-child', kind, path],
+                            capture_output=True, text=True)
+    try:
+        return int(result.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return None
+
+
+def legacy_normalize(meal: Dict) -> tuple:
+    """The per-call normalization the scorer performed on raw dicts"""
+    return (meal.get('cuisine_type', '').lower(),
+            meal.get('category', '').lower(),
+            [ing.lower() for ing in meal.get('ingredients', [])],
+            meal.get('name', '').lower())
+
+
+def record_normalize(meal) -> tuple:
+    return (meal.cuisine, meal.category, meal.ingredients, meal.name_lower)
+
+
+def time_per_meal(items, fn: Callable) -> float:
+    """Average microseconds per item"""
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / max(len(items), 1) * 1e6
+
+
+def run(size: int = 100_000):
+    print(f"📦 Building synthetic menu with {size:,} meals...")
+    raw_menu = build_synthetic_menu(size)
+    with tempfile.NamedTemporaryFile('w', suffix='.json', prefix='meals-', delete=False) as file:
+        json.dump(raw_menu, file)
+        menu_path = file.name
+
+    try:
+        dict_bytes = measure_memory(lambda: load_menu('dicts', menu_path))
+        catalog_bytes = measure_memory(lambda: load_menu('catalog', menu_path))
+        dict_rss = measure_rss('dicts', menu_path)
+        catalog_rss = measure_rss('catalog', menu_path)
+    finally:
+        os.remove(menu_path)
+    catalog = MealCatalog(raw_menu)
+
+    print(f"🧠 Memory  dicts:   {dict_bytes / 1e6:8.1f} MB ({dict_bytes / size:6.0f} B/meal)")
+    print(f"🧠 Memory  catalog: {catalog_bytes / 1e6:8.1f} MB ({catalog_bytes / size:6.0f} B/meal)")
+    print(f"   Interned: {len(catalog.cuisines)} cuisines, {len(catalog.categories)} categories, "
+          f"{len(catalog.ingredients)} ingredients")
+    if dict_rss is not None and catalog_rss is not None:
+        print(f"🧠 RSS     dicts:   {dict_rss / 1e6:8.1f} MB ({dict_rss / size:6.0f} B/meal)")
+        print(f"🧠 RSS     catalog: {catalog_rss / 1e6:8.1f} MB ({catalog_rss / size:6.0f} B/meal)")
+    else:
+        print("🧠 RSS     unavailable on this platform")
+
+    legacy_us = time_per_meal(raw_menu, legacy_normalize)
+    record_us = time_per_meal(catalog.meals, record_normalize)
+    print(f"⏱️  Normalize  dicts:   {legacy_us:6.2f} µs/meal")
+    print(f"⏱️  Normalize  catalog: {record_us:6.2f} µs/meal")
+
+    legacy_score_us = time_per_meal(raw_menu,
+                                    lambda m: legacy_calculate_meal_compatibility_score(m, SAMPLE_PREFERENCES))
+    profile = PreferenceProfile(SAMPLE_PREFERENCES)
+    score_us = time_per_meal(catalog.meals,
+                             lambda m: calculate_meal_compatibility_score(m, SAMPLE_PREFERENCES, profile))
+    print(f"🎯 Scoring   dicts:   {legacy_score_us:6.2f} µs/meal (pre-catalog scorer)")
+    print(f"🎯 Scoring   catalog: {score_us:6.2f} µs/meal")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--rss-child':
+        print(rss_child(sys.argv[2], sys.argv[3]))
+    else:
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
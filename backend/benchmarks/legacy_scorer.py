@@ -0,0 +1,247 @@
+"""
+Frozen copy of the dict-based meal scorer from before MealCatalog
+
+Kept only as the baseline for benchmark_catalog.py: it scores raw meals.json
+dicts, re-normalizing every meal and re-aggregating the user's history on each
+call, exactly as the service did. Do not use it for serving or change its logic.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+
+def calculate_meal_compatibility_score(meal: Dict, preferences: Dict) -> float:
+    """
+    Calculate how compatible a meal is with user preferences using advanced scoring
+    
+    Args:
+        meal (Dict): Meal from meals.json
+        preferences (Dict): User's preference history
+    
+    Returns:
+        float: Compatibility score (higher = better match)
+    """
+    score = 0.0
+    
+    # Extract preference data
+    liked_meals = extract_meal_names(preferences.get('liked', []))
+    disliked_meals = extract_meal_names(preferences.get('disliked', []))
+    neutral_meals = extract_meal_names(preferences.get('neutral', []))
+    
+    meal_name = meal.get('name', '')
+    meal_cuisine = meal.get('cuisine_type', '').lower()
+    meal_category = meal.get('category', '').lower()
+    meal_ingredients = [ing.lower() for ing in meal.get('ingredients', [])]
+    
+    # 1. DIRECT PREFERENCE MATCHING (Highest Impact)
+    if meal_name in liked_meals:
+        return 1000.0  # Maximum score for previously liked meals
+    
+    if meal_name in disliked_meals:
+        return -1000.0  # Minimum score for previously disliked meals
+    
+    if meal_name in neutral_meals:
+        score += 10.0  # Small boost for neutral meals
+    
+    # 2. CUISINE TYPE ANALYSIS
+    liked_cuisines = get_cuisines_from_meals(preferences.get('liked', []))
+    disliked_cuisines = get_cuisines_from_meals(preferences.get('disliked', []))
+    
+    if meal_cuisine in liked_cuisines:
+        cuisine_frequency = liked_cuisines.count(meal_cuisine)
+        score += 50.0 * cuisine_frequency  # More points for frequently liked cuisines
+    
+    if meal_cuisine in disliked_cuisines:
+        cuisine_frequency = disliked_cuisines.count(meal_cuisine)
+        score -= 30.0 * cuisine_frequency  # Penalty for disliked cuisines
+    
+    # 3. CATEGORY ANALYSIS
+    liked_categories = get_categories_from_meals(preferences.get('liked', []))
+    disliked_categories = get_categories_from_meals(preferences.get('disliked', []))
+    
+    if meal_category in liked_categories:
+        category_frequency = liked_categories.count(meal_category)
+        score += 30.0 * category_frequency
+    
+    if meal_category in disliked_categories:
+        category_frequency = disliked_categories.count(meal_category)
+        score -= 20.0 * category_frequency
+    
+    # 4. INGREDIENT COMPATIBILITY ANALYSIS
+    liked_ingredients = get_ingredients_from_meals(preferences.get('liked', []))
+    disliked_ingredients = get_ingredients_from_meals(preferences.get('disliked', []))
+    
+    # Count matching ingredients
+    liked_ingredient_matches = sum(1 for ing in meal_ingredients if ing in liked_ingredients)
+    disliked_ingredient_matches = sum(1 for ing in meal_ingredients if ing in disliked_ingredients)
+    
+    score += liked_ingredient_matches * 15.0  # Boost for liked ingredients
+    score -= disliked_ingredient_matches * 10.0  # Penalty for disliked ingredients
+    
+    # 5. DIETARY PATTERN RECOGNITION
+    if has_healthy_preference(preferences):
+        healthy_keywords = ['quinoa', 'avocado', 'salmon', 'vegetables', 'salad']
+        healthy_matches = sum(1 for keyword in healthy_keywords 
+                            if any(keyword in ing.lower() for ing in meal_ingredients + [meal_name.lower()]))
+        score += healthy_matches * 20.0
+    
+    if has_comfort_food_preference(preferences):
+        comfort_keywords = ['cheese', 'pasta', 'pizza', 'burger', 'fries']
+        comfort_matches = sum(1 for keyword in comfort_keywords 
+                            if any(keyword in ing.lower() for ing in meal_ingredients + [meal_name.lower()]))
+        score += comfort_matches * 15.0
+    
+    # 6. PRICE PREFERENCE ANALYSIS
+    preferred_price_range = get_preferred_price_range(preferences)
+    meal_price = meal.get('price', 0)
+    
+    if preferred_price_range:
+        min_price, max_price = preferred_price_range
+        if min_price <= meal_price <= max_price:
+            score += 25.0  # Bonus for being in preferred price range
+        else:
+            # Small penalty for being outside preferred range
+            distance_from_range = min(abs(meal_price - min_price), abs(meal_price - max_price))
+            score -= distance_from_range * 2.0
+    
+    # 7. DIVERSITY BONUS (Encourage trying new things)
+    if not preferences.get('liked') and not preferences.get('disliked'):
+        # New user - recommend popular items
+        popular_cuisines = ['italian', 'american', 'mexican']
+        if meal_cuisine in popular_cuisines:
+            score += 40.0
+    else:
+        # Existing user - small bonus for new cuisines/categories
+        if meal_cuisine not in (liked_cuisines + disliked_cuisines):
+            score += 10.0  # Encourage culinary exploration
+    
+    return score
+
+def extract_meal_names(meal_list: List) -> List[str]:
+    """Extract meal names from mixed format preference list"""
+    names = []
+    for item in meal_list:
+        if isinstance(item, dict):
+            names.append(item.get('name', ''))
+        else:
+            names.append(str(item))
+    return [name for name in names if name]
+
+def get_cuisines_from_meals(meal_list: List) -> List[str]:
+    """Extract cuisine types from user's meal history"""
+    cuisines = []
+    # Note: This would ideally look up cuisines from the full meal database
+    # For now, we'll use some heuristics based on meal names
+    meal_names = extract_meal_names(meal_list)
+    
+    cuisine_keywords = {
+        'italian': ['pizza', 'pasta', 'margherita', 'primavera'],
+        'mexican': ['burrito', 'tacos', 'salsa', 'guacamole'],
+        'asian': ['stir fry', 'pad thai', 'sushi', 'rice'],
+        'american': ['burger', 'sandwich', 'caesar', 'bbq'],
+        'mediterranean': ['gyro', 'bowl', 'quinoa', 'feta'],
+        'indian': ['curry', 'tikka', 'masala'],
+        'thai': ['pad thai', 'curry'],
+        'greek': ['gyro', 'tzatziki', 'olives']
+    }
+    
+    for meal_name in meal_names:
+        meal_lower = meal_name.lower()
+        for cuisine, keywords in cuisine_keywords.items():
+            if any(keyword in meal_lower for keyword in keywords):
+                cuisines.append(cuisine)
+                break
+    
+    return cuisines
+
+def get_categories_from_meals(meal_list: List) -> List[str]:
+    """Extract categories from user's meal history"""
+    categories = []
+    meal_names = extract_meal_names(meal_list)
+    
+    category_keywords = {
+        'salad': ['salad', 'bowl', 'quinoa'],
+        'pizza': ['pizza', 'margherita'],
+        'pasta': ['pasta', 'primavera'],
+        'sandwich': ['sandwich', 'burger', 'gyro'],
+        'bowl': ['bowl', 'burrito'],
+        'seafood': ['salmon', 'fish', 'sushi'],
+        'curry': ['curry', 'tikka', 'masala']
+    }
+    
+    for meal_name in meal_names:
+        meal_lower = meal_name.lower()
+        for category, keywords in category_keywords.items():
+            if any(keyword in meal_lower for keyword in keywords):
+                categories.append(category)
+                break
+    
+    return categories
+
+def get_ingredients_from_meals(meal_list: List) -> List[str]:
+    """Extract common ingredients from meal names (heuristic approach)"""
+    ingredients = []
+    meal_names = extract_meal_names(meal_list)
+    
+    common_ingredients = [
+        'chicken', 'beef', 'salmon', 'fish', 'cheese', 'avocado',
+        'tomato', 'lettuce', 'pasta', 'rice', 'quinoa', 'vegetables',
+        'beans', 'peppers', 'onion', 'garlic', 'herbs', 'spices'
+    ]
+    
+    for meal_name in meal_names:
+        meal_lower = meal_name.lower()
+        for ingredient in common_ingredients:
+            if ingredient in meal_lower:
+                ingredients.append(ingredient)
+    
+    return ingredients
+
+def has_healthy_preference(preferences: Dict) -> bool:
+    """Determine if user prefers healthy options"""
+    liked_meals = extract_meal_names(preferences.get('liked', []))
+    healthy_keywords = ['salad', 'quinoa', 'bowl', 'vegetarian', 'salmon', 'vegetables']
+    
+    healthy_count = sum(1 for meal in liked_meals 
+                       if any(keyword in meal.lower() for keyword in healthy_keywords))
+    
+    return healthy_count >= len(liked_meals) * 0.3  # 30% or more healthy meals
+
+def has_comfort_food_preference(preferences: Dict) -> bool:
+    """Determine if user prefers comfort food"""
+    liked_meals = extract_meal_names(preferences.get('liked', []))
+    comfort_keywords = ['pizza', 'burger', 'pasta', 'sandwich', 'bbq', 'cheese']
+    
+    comfort_count = sum(1 for meal in liked_meals 
+                       if any(keyword in meal.lower() for keyword in comfort_keywords))
+    
+    return comfort_count >= len(liked_meals) * 0.3  # 30% or more comfort food
+
+def get_preferred_price_range(preferences: Dict) -> Optional[Tuple[float, float]]:
+    """Determine user's preferred price range based on history"""
+    liked_meals = preferences.get('liked', [])
+    if not liked_meals:
+        return None
+    
+    # This is a simplified approach - in a real system, you'd look up actual prices
+    # For now, we'll estimate based on meal types
+    estimated_prices = []
+    for meal in liked_meals:
+        meal_name = meal.get('name', '') if isinstance(meal, dict) else str(meal)
+        meal_lower = meal_name.lower()
+        
+        # Estimate price based on meal type
+        if any(keyword in meal_lower for keyword in ['salmon', 'steak', 'premium']):
+            estimated_prices.append(18.0)
+        elif any(keyword in meal_lower for keyword in ['pizza', 'pasta', 'sandwich']):
+            estimated_prices.append(12.0)
+        elif any(keyword in meal_lower for keyword in ['salad', 'bowl', 'soup']):
+            estimated_prices.append(10.0)
+        else:
+            estimated_prices.append(13.0)
+    
+    if estimated_prices:
+        avg_price = sum(estimated_prices) / len(estimated_prices)
+        return (avg_price * 0.7, avg_price * 1.3)  # ±30% range
+    
+    return None
+
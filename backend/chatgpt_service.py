@@ -1,104 +1,204 @@
-import openai
+import hashlib
 import json
 import random
+import threading
 from typing import Dict, List, Optional, Tuple
-from collections import Counter
 import math
-from dotenv import load_dotenv
 import os
+import time
+import weakref
+from functools import lru_cache
+from meal_catalog import MealCatalog, as_meal_record, get_cached_catalog
+from keyword_matcher import KeywordMatcher
+from popularity import get_popularity_table
+from collaborative import get_cf_model
+from alloc_profiler import profile_stage
+from preference_history import (PREFERENCE_CATEGORIES, decay_summary, decay_weight,
+                                entry_name, folded_ratings, recent_names)
 
 # ===== CHATGPT API CONFIGURATION =====
 # TODO: Add your OpenAI API key here
+# The openai package and .env are only loaded on the first LLM call, so workers
+# that never reach the LLM (fallback mode, auth-only traffic) skip that cost.
 
-load_dotenv()
+OPENAI_API_KEY = None  # Resolved from the environment on first use
+_openai_client = None
+_openai_lock = threading.Lock()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Replace with your actual API key
-openai.api_key = OPENAI_API_KEY
+def get_openai_client():
+    """Import and configure the OpenAI client on first use"""
+    global _openai_client, OPENAI_API_KEY
+    if _openai_client is None:
+        with _openai_lock:
+            if _openai_client is None:
+                import openai
+                from dotenv import load_dotenv
+                
+                load_dotenv()
+                OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Replace with your actual API key
+                openai.api_key = OPENAI_API_KEY
+                _openai_client = openai
+    return _openai_client
+
+# ===== RESPONSE SOURCE =====
+# Records whether the last recommendation on this thread came from the LLM or
+# from the local fallback scorer (read by traffic capture in app.py)
+
+RESPONSE_SOURCE_LLM = 'llm'
+RESPONSE_SOURCE_FALLBACK = 'fallback'
+RESPONSE_SOURCE_CACHE = 'cache'
+RESPONSE_SOURCE_POPULARITY = 'popularity'
+
+_response_source = threading.local()
+
+def set_response_source(source: Optional[str]):
+    _response_source.value = source
+
+def get_last_response_source() -> Optional[str]:
+    """Source of the most recent recommendation made on the current thread"""
+    return getattr(_response_source, 'value', None)
+
+# ===== KEYWORD TABLES =====
+# Compiled into KeywordMatchers once (by the app factory, or lazily on first use)
+
+CUISINE_KEYWORDS = {
+    'italian': ['pizza', 'pasta', 'margherita', 'primavera'],
+    'mexican': ['burrito', 'tacos', 'salsa', 'guacamole'],
+    'asian': ['stir fry', 'pad thai', 'sushi', 'rice'],
+    'american': ['burger', 'sandwich', 'caesar', 'bbq'],
+    'mediterranean': ['gyro', 'bowl', 'quinoa', 'feta'],
+    'indian': ['curry', 'tikka', 'masala'],
+    'thai': ['pad thai', 'curry'],
+    'greek': ['gyro', 'tzatziki', 'olives']
+}
+
+CATEGORY_KEYWORDS = {
+    'salad': ['salad', 'bowl', 'quinoa'],
+    'pizza': ['pizza', 'margherita'],
+    'pasta': ['pasta', 'primavera'],
+    'sandwich': ['sandwich', 'burger', 'gyro'],
+    'bowl': ['bowl', 'burrito'],
+    'seafood': ['salmon', 'fish', 'sushi'],
+    'curry': ['curry', 'tikka', 'masala']
+}
+
+COMMON_INGREDIENTS = [
+    'chicken', 'beef', 'salmon', 'fish', 'cheese', 'avocado',
+    'tomato', 'lettuce', 'pasta', 'rice', 'quinoa', 'vegetables',
+    'beans', 'peppers', 'onion', 'garlic', 'herbs', 'spices'
+]
+
+HEALTHY_PREFERENCE_KEYWORDS = ['salad', 'quinoa', 'bowl', 'vegetarian', 'salmon', 'vegetables']
+COMFORT_PREFERENCE_KEYWORDS = ['pizza', 'burger', 'pasta', 'sandwich', 'bbq', 'cheese']
+
+# Matched against a candidate meal's ingredients and name during scoring
+MEAL_HEALTHY_KEYWORDS = ('quinoa', 'avocado', 'salmon', 'vegetables', 'salad')
+MEAL_COMFORT_KEYWORDS = ('cheese', 'pasta', 'pizza', 'burger', 'fries')
+
+# Weight of the global popularity prior (0..1, 0.5 = no signal) in the diversity stage.
+# For new users an unrated meal from a seeded popular cuisine scores +40, as before;
+# existing users get only the data-driven part, so without ratings their scores are unchanged.
+NEW_USER_POPULARITY_WEIGHT = 160.0
+EXISTING_USER_POPULARITY_WEIGHT = 40.0
+
+# Weight of the collaborative filtering term (predicted rating, roughly -1..1)
+CF_WEIGHT = 50.0
+
+_keyword_matchers: Optional[Dict[str, KeywordMatcher]] = None
 
-def calculate_meal_compatibility_score(meal: Dict, preferences: Dict) -> float:
+def keyword_tables() -> Dict[str, Dict[str, List[str]]]:
+    """Every keyword table used by the preference heuristics, as label -> keywords"""
+    return {
+        'cuisine': CUISINE_KEYWORDS,
+        'category': CATEGORY_KEYWORDS,
+        'ingredient': {ingredient: [ingredient] for ingredient in COMMON_INGREDIENTS},
+        'healthy': {'healthy': HEALTHY_PREFERENCE_KEYWORDS},
+        'comfort': {'comfort': COMFORT_PREFERENCE_KEYWORDS},
+    }
+
+def keyword_tables_fingerprint() -> str:
+    """Content hash of the keyword tables (invalidates startup snapshots when they change)"""
+    encoded = json.dumps(keyword_tables(), sort_keys=True).encode()
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+def build_keyword_matchers() -> Dict[str, KeywordMatcher]:
+    """Compile every keyword table used by the preference heuristics"""
+    return {name: KeywordMatcher(table) for name, table in keyword_tables().items()}
+
+def install_keyword_matchers(matchers: Dict[str, KeywordMatcher]):
+    """Use prebuilt matchers (e.g. from the app factory or a startup snapshot)"""
+    global _keyword_matchers
+    _keyword_matchers = matchers
+
+def get_keyword_matchers() -> Dict[str, KeywordMatcher]:
+    global _keyword_matchers
+    if _keyword_matchers is None:
+        _keyword_matchers = build_keyword_matchers()
+    return _keyword_matchers
+
+def calculate_meal_compatibility_score(meal: Dict, preferences: Dict,
+                                       profile: Optional['PreferenceProfile'] = None) -> float:
     """
     Calculate how compatible a meal is with user preferences using advanced scoring
     
     Args:
-        meal (Dict): Meal from meals.json
+        meal (MealRecord | Dict): Meal from the catalog (raw dicts are interned on the fly)
         preferences (Dict): User's preference history
+        profile (PreferenceProfile): Decayed aggregate of preferences; build it once per
+            request when scoring many meals (built on the fly if omitted)
     
     Returns:
         float: Compatibility score (higher = better match)
     """
     score = 0.0
+    meal = as_meal_record(meal)
+    if profile is None:
+        profile = PreferenceProfile(preferences)
     
-    # Extract preference data
-    liked_meals = extract_meal_names(preferences.get('liked', []))
-    disliked_meals = extract_meal_names(preferences.get('disliked', []))
-    neutral_meals = extract_meal_names(preferences.get('neutral', []))
-    
-    meal_name = meal.get('name', '')
-    meal_cuisine = meal.get('cuisine_type', '').lower()
-    meal_category = meal.get('category', '').lower()
-    meal_ingredients = [ing.lower() for ing in meal.get('ingredients', [])]
+    # Profile weights laid out by the catalog's interned ids: lookups below are
+    # list indexing, with no per-meal key strings or lists
+    meal_name = meal.name
+    catalog_weights = profile.for_catalog(meal.catalog)
     
     # 1. DIRECT PREFERENCE MATCHING (Highest Impact)
-    if meal_name in liked_meals:
+    if meal_name in profile.liked_names:
         return 1000.0  # Maximum score for previously liked meals
     
-    if meal_name in disliked_meals:
+    if meal_name in profile.disliked_names:
         return -1000.0  # Minimum score for previously disliked meals
     
-    if meal_name in neutral_meals:
+    if meal_name in profile.neutral_names:
         score += 10.0  # Small boost for neutral meals
     
-    # 2. CUISINE TYPE ANALYSIS
-    liked_cuisines = get_cuisines_from_meals(preferences.get('liked', []))
-    disliked_cuisines = get_cuisines_from_meals(preferences.get('disliked', []))
-    
-    if meal_cuisine in liked_cuisines:
-        cuisine_frequency = liked_cuisines.count(meal_cuisine)
-        score += 50.0 * cuisine_frequency  # More points for frequently liked cuisines
+    # 2. CUISINE TYPE ANALYSIS (weights are time-decayed rating counts)
+    liked_cuisine_weight = catalog_weights.liked_cuisine[meal.cuisine_id]
+    disliked_cuisine_weight = catalog_weights.disliked_cuisine[meal.cuisine_id]
     
-    if meal_cuisine in disliked_cuisines:
-        cuisine_frequency = disliked_cuisines.count(meal_cuisine)
-        score -= 30.0 * cuisine_frequency  # Penalty for disliked cuisines
+    score += 50.0 * liked_cuisine_weight  # More points for frequently liked cuisines
+    score -= 30.0 * disliked_cuisine_weight  # Penalty for disliked cuisines
     
     # 3. CATEGORY ANALYSIS
-    liked_categories = get_categories_from_meals(preferences.get('liked', []))
-    disliked_categories = get_categories_from_meals(preferences.get('disliked', []))
-    
-    if meal_category in liked_categories:
-        category_frequency = liked_categories.count(meal_category)
-        score += 30.0 * category_frequency
-    
-    if meal_category in disliked_categories:
-        category_frequency = disliked_categories.count(meal_category)
-        score -= 20.0 * category_frequency
+    score += 30.0 * catalog_weights.liked_category[meal.category_id]
+    score -= 20.0 * catalog_weights.disliked_category[meal.category_id]
     
     # 4. INGREDIENT COMPATIBILITY ANALYSIS
-    liked_ingredients = get_ingredients_from_meals(preferences.get('liked', []))
-    disliked_ingredients = get_ingredients_from_meals(preferences.get('disliked', []))
-    
-    # Count matching ingredients
-    liked_ingredient_matches = sum(1 for ing in meal_ingredients if ing in liked_ingredients)
-    disliked_ingredient_matches = sum(1 for ing in meal_ingredients if ing in disliked_ingredients)
+    # Each matching ingredient counts at most once, scaled down as the ratings behind it age
+    liked_ingredient_matches = sum(map(catalog_weights.liked_ingredient.__getitem__, meal.ingredient_ids))
+    disliked_ingredient_matches = sum(map(catalog_weights.disliked_ingredient.__getitem__, meal.ingredient_ids))
     
     score += liked_ingredient_matches * 15.0  # Boost for liked ingredients
     score -= disliked_ingredient_matches * 10.0  # Penalty for disliked ingredients
     
-    # 5. DIETARY PATTERN RECOGNITION
-    if has_healthy_preference(preferences):
-        healthy_keywords = ['quinoa', 'avocado', 'salmon', 'vegetables', 'salad']
-        healthy_matches = sum(1 for keyword in healthy_keywords 
-                            if any(keyword in ing.lower() for ing in meal_ingredients + [meal_name.lower()]))
-        score += healthy_matches * 20.0
+    # 5. DIETARY PATTERN RECOGNITION (keyword hits per meal are precomputed per catalog)
+    if profile.healthy_preference:
+        score += catalog_weights.features.healthy_hits[meal.index] * 20.0
     
-    if has_comfort_food_preference(preferences):
-        comfort_keywords = ['cheese', 'pasta', 'pizza', 'burger', 'fries']
-        comfort_matches = sum(1 for keyword in comfort_keywords 
-                            if any(keyword in ing.lower() for ing in meal_ingredients + [meal_name.lower()]))
-        score += comfort_matches * 15.0
+    if profile.comfort_preference:
+        score += catalog_weights.features.comfort_hits[meal.index] * 15.0
     
     # 6. PRICE PREFERENCE ANALYSIS
-    preferred_price_range = get_preferred_price_range(preferences)
-    meal_price = meal.get('price', 0)
+    preferred_price_range = profile.price_range
+    meal_price = meal.price
     
     if preferred_price_range:
         min_price, max_price = preferred_price_range
@@ -110,18 +210,21 @@ def calculate_meal_compatibility_score(meal: Dict, preferences: Dict) -> float:
             score -= distance_from_range * 2.0
     
     # 7. DIVERSITY BONUS (Encourage trying new things)
-    if not preferences.get('liked') and not preferences.get('disliked'):
-        # New user - recommend popular items
-        popular_cuisines = ['italian', 'american', 'mexican']
-        if meal_cuisine in popular_cuisines:
-            score += 40.0
+    if is_new_user(preferences):
+        # New user - recommend items other diners rate highly
+        score += NEW_USER_POPULARITY_WEIGHT * (get_popularity_table().seeded_prior(meal) - 0.5)
     else:
         # Existing user - small bonus for new cuisines/categories
-        if meal_cuisine not in (liked_cuisines + disliked_cuisines):
+        if not liked_cuisine_weight and not disliked_cuisine_weight:
             score += 10.0  # Encourage culinary exploration
+        score += EXISTING_USER_POPULARITY_WEIGHT * (get_popularity_table().prior(meal) - 0.5)
     
     return score
 
+def is_new_user(preferences: Dict) -> bool:
+    """A user with no likes or dislikes yet"""
+    return not preferences.get('liked') and not preferences.get('disliked')
+
 def extract_meal_names(meal_list: List) -> List[str]:
     """Extract meal names from mixed format preference list"""
     names = []
@@ -132,177 +235,217 @@ def extract_meal_names(meal_list: List) -> List[str]:
             names.append(str(item))
     return [name for name in names if name]
 
-def get_cuisines_from_meals(meal_list: List) -> List[str]:
-    """Extract cuisine types from user's meal history"""
-    cuisines = []
-    # Note: This would ideally look up cuisines from the full meal database
-    # For now, we'll use some heuristics based on meal names
-    meal_names = extract_meal_names(meal_list)
-    
-    cuisine_keywords = {
-        'italian': ['pizza', 'pasta', 'margherita', 'primavera'],
-        'mexican': ['burrito', 'tacos', 'salsa', 'guacamole'],
-        'asian': ['stir fry', 'pad thai', 'sushi', 'rice'],
-        'american': ['burger', 'sandwich', 'caesar', 'bbq'],
-        'mediterranean': ['gyro', 'bowl', 'quinoa', 'feta'],
-        'indian': ['curry', 'tikka', 'masala'],
-        'thai': ['pad thai', 'curry'],
-        'greek': ['gyro', 'tzatziki', 'olives']
-    }
-    
-    for meal_name in meal_names:
-        meal_lower = meal_name.lower()
-        for cuisine, keywords in cuisine_keywords.items():
-            if any(keyword in meal_lower for keyword in keywords):
-                cuisines.append(cuisine)
-                break
-    
-    return cuisines
-
-def get_categories_from_meals(meal_list: List) -> List[str]:
-    """Extract categories from user's meal history"""
-    categories = []
-    meal_names = extract_meal_names(meal_list)
-    
-    category_keywords = {
-        'salad': ['salad', 'bowl', 'quinoa'],
-        'pizza': ['pizza', 'margherita'],
-        'pasta': ['pasta', 'primavera'],
-        'sandwich': ['sandwich', 'burger', 'gyro'],
-        'bowl': ['bowl', 'burrito'],
-        'seafood': ['salmon', 'fish', 'sushi'],
-        'curry': ['curry', 'tikka', 'masala']
-    }
-    
-    for meal_name in meal_names:
-        meal_lower = meal_name.lower()
-        for category, keywords in category_keywords.items():
-            if any(keyword in meal_lower for keyword in keywords):
-                categories.append(category)
-                break
+def estimate_meal_price(meal_name: str) -> float:
+    """Estimate a rated meal's price from its name (preferences don't carry real prices)"""
+    meal_lower = meal_name.lower()
+    if any(keyword in meal_lower for keyword in ['salmon', 'steak', 'premium']):
+        return 18.0
+    if any(keyword in meal_lower for keyword in ['pizza', 'pasta', 'sandwich']):
+        return 12.0
+    if any(keyword in meal_lower for keyword in ['salad', 'bowl', 'soup']):
+        return 10.0
+    return 13.0
+
+@lru_cache(maxsize=4096)
+def meal_name_features(meal_name: str) -> Dict[str, float]:
+    """
+    Feature counters one rated meal contributes to a preference profile
     
-    return categories
+    Keys: 'count', 'price' (estimated), 'cuisine:<c>', 'category:<c>',
+    'ingredient:<i>', 'healthy', 'comfort'. Callers must not mutate the result.
+    """
+    matchers = get_keyword_matchers()
+    meal_lower = meal_name.lower()
+    features = {'count': 1.0, 'price': estimate_meal_price(meal_name)}
+    
+    cuisine = matchers['cuisine'].first(meal_lower)
+    if cuisine:
+        features['cuisine:' + cuisine] = 1.0
+    category = matchers['category'].first(meal_lower)
+    if category:
+        features['category:' + category] = 1.0
+    for ingredient in matchers['ingredient'].all(meal_lower):
+        features['ingredient:' + ingredient] = 1.0
+    if matchers['healthy'].any(meal_lower):
+        features['healthy'] = 1.0
+    if matchers['comfort'].any(meal_lower):
+        features['comfort'] = 1.0
+    return features
 
-def get_ingredients_from_meals(meal_list: List) -> List[str]:
-    """Extract common ingredients from meal names (heuristic approach)"""
-    ingredients = []
-    meal_names = extract_meal_names(meal_list)
+class PreferenceProfile:
+    """
+    Time-decayed aggregate of a user's ratings, built once per request
     
-    common_ingredients = [
-        'chicken', 'beef', 'salmon', 'fish', 'cheese', 'avocado',
-        'tomato', 'lettuce', 'pasta', 'rice', 'quinoa', 'vegetables',
-        'beans', 'peppers', 'onion', 'garlic', 'herbs', 'spices'
-    ]
+    Combines the capped raw history (each entry weighted by its age) with the
+    decayed summary counters of entries already folded out of it.
+    """
     
-    for meal_name in meal_names:
-        meal_lower = meal_name.lower()
-        for ingredient in common_ingredients:
-            if ingredient in meal_lower:
-                ingredients.append(ingredient)
+    __slots__ = ('liked_names', 'disliked_names', 'neutral_names', 'weights',
+                 'healthy_preference', 'comfort_preference', 'price_range', '_catalog_weights')
     
-    return ingredients
+    def __init__(self, preferences: Dict, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        summary = decay_summary(preferences.get('summary'), now)
+        self.weights = {category: dict(summary['counters'][category]) for category in PREFERENCE_CATEGORIES}
+        
+        for category in PREFERENCE_CATEGORIES:
+            counters = self.weights[category]
+            for entry in preferences.get(category, []):
+                name = entry_name(entry)
+                if not name:
+                    continue
+                weight = decay_weight(entry.get('rated_at') if isinstance(entry, dict) else None, now)
+                for key, value in meal_name_features(name).items():
+                    counters[key] = counters.get(key, 0.0) + value * weight
+        
+        self.liked_names = set(extract_meal_names(preferences.get('liked', [])))
+        self.disliked_names = set(extract_meal_names(preferences.get('disliked', [])))
+        self.neutral_names = set(extract_meal_names(preferences.get('neutral', [])))
+        # Ratings folded out of the raw history keep their hard like/dislike match
+        names_by_category = {'liked': self.liked_names, 'disliked': self.disliked_names,
+                             'neutral': self.neutral_names}
+        for name, category in folded_ratings(preferences).items():
+            names_by_category[category].add(name)
+        
+        # Derived once here rather than on every per-meal lookup
+        liked_weight = self.weight('liked', 'count')
+        self.healthy_preference = self.weight('liked', 'healthy') >= liked_weight * 0.3  # 30% or more healthy meals
+        self.comfort_preference = self.weight('liked', 'comfort') >= liked_weight * 0.3  # 30% or more comfort food
+        if liked_weight:
+            avg_price = self.weight('liked', 'price') / liked_weight
+            self.price_range = (avg_price * 0.7, avg_price * 1.3)  # ±30% range
+        else:
+            self.price_range = None
+        self._catalog_weights = None
+    
+    def weight(self, category: str, key: str) -> float:
+        return self.weights[category].get(key, 0.0)
+    
+    def for_catalog(self, catalog: MealCatalog) -> 'CatalogWeights':
+        """This profile's weights indexed by the catalog's interned ids (cached per catalog)"""
+        catalog_weights = self._catalog_weights
+        if (catalog_weights is None or catalog_weights.catalog is not catalog
+                or catalog_weights.meal_count != len(catalog.meals)):
+            catalog_weights = self._catalog_weights = CatalogWeights(self, catalog)
+        return catalog_weights
+    
+    def top_cuisines(self, category: str = 'liked', limit: int = 3) -> List[Tuple[str, float]]:
+        cuisines = [(key[len('cuisine:'):], value) for key, value in self.weights[category].items()
+                    if key.startswith('cuisine:')]
+        return sorted(cuisines, key=lambda item: item[1], reverse=True)[:limit]
+
+# ===== PER-CATALOG SCORING INPUTS =====
+# What scoring needs from a meal that doesn't depend on the user is computed
+# once per catalog: profile keys for every interned cuisine/category/ingredient
+# and dietary keyword hits for every meal.
+
+class CatalogFeatures:
+    """User-independent scoring inputs for one catalog (by interned id / meal index)"""
+    
+    __slots__ = ('cuisine_keys', 'category_keys', 'ingredient_keys', 'healthy_hits', 'comfort_hits')
+    
+    def __init__(self):
+        self.cuisine_keys: List[str] = []
+        self.category_keys: List[str] = []
+        self.ingredient_keys: List[str] = []
+        self.healthy_hits: List[int] = []
+        self.comfort_hits: List[int] = []
+    
+    def update(self, catalog: MealCatalog):
+        """Cover values and meals added to the catalog since the last call"""
+        for keys, table, prefix in ((self.cuisine_keys, catalog.cuisines, 'cuisine:'),
+                                    (self.category_keys, catalog.categories, 'category:'),
+                                    (self.ingredient_keys, catalog.ingredients, 'ingredient:')):
+            keys.extend(prefix + value for value in table.lowered[len(keys):])
+        for meal in catalog.meals[len(self.healthy_hits):]:
+            # No keyword contains a newline, so a hit here is a hit in one of the terms
+            meal_terms = '\n'.join(meal.ingredients) + '\n' + meal.name_lower
+            self.healthy_hits.append(sum(1 for keyword in MEAL_HEALTHY_KEYWORDS if keyword in meal_terms))
+            self.comfort_hits.append(sum(1 for keyword in MEAL_COMFORT_KEYWORDS if keyword in meal_terms))
+
+_catalog_features = weakref.WeakKeyDictionary()
+_catalog_features_lock = threading.Lock()
+
+def get_catalog_features(catalog: MealCatalog) -> CatalogFeatures:
+    """Scoring inputs for catalog, built on first use and extended if it grew"""
+    with _catalog_features_lock:
+        features = _catalog_features.get(catalog)
+        if features is None:
+            features = _catalog_features[catalog] = CatalogFeatures()
+        features.update(catalog)
+    return features
+
+class CatalogWeights:
+    """A PreferenceProfile's weights laid out by one catalog's interned ids"""
+    
+    __slots__ = ('catalog', 'meal_count', 'features', 'liked_cuisine', 'disliked_cuisine',
+                 'liked_category', 'disliked_category', 'liked_ingredient', 'disliked_ingredient')
+    
+    def __init__(self, profile: PreferenceProfile, catalog: MealCatalog):
+        self.catalog = catalog
+        self.meal_count = len(catalog.meals)
+        self.features = features = get_catalog_features(catalog)
+        liked, disliked = profile.weights['liked'], profile.weights['disliked']
+        self.liked_cuisine = [liked.get(key, 0.0) for key in features.cuisine_keys]
+        self.disliked_cuisine = [disliked.get(key, 0.0) for key in features.cuisine_keys]
+        self.liked_category = [liked.get(key, 0.0) for key in features.category_keys]
+        self.disliked_category = [disliked.get(key, 0.0) for key in features.category_keys]
+        # Each matching ingredient counts at most once
+        self.liked_ingredient = [min(liked.get(key, 0.0), 1.0) for key in features.ingredient_keys]
+        self.disliked_ingredient = [min(disliked.get(key, 0.0), 1.0) for key in features.ingredient_keys]
 
 def has_healthy_preference(preferences: Dict) -> bool:
     """Determine if user prefers healthy options"""
-    liked_meals = extract_meal_names(preferences.get('liked', []))
-    healthy_keywords = ['salad', 'quinoa', 'bowl', 'vegetarian', 'salmon', 'vegetables']
-    
-    healthy_count = sum(1 for meal in liked_meals 
-                       if any(keyword in meal.lower() for keyword in healthy_keywords))
-    
-    return healthy_count >= len(liked_meals) * 0.3  # 30% or more healthy meals
+    return PreferenceProfile(preferences).healthy_preference
 
 def has_comfort_food_preference(preferences: Dict) -> bool:
     """Determine if user prefers comfort food"""
-    liked_meals = extract_meal_names(preferences.get('liked', []))
-    comfort_keywords = ['pizza', 'burger', 'pasta', 'sandwich', 'bbq', 'cheese']
-    
-    comfort_count = sum(1 for meal in liked_meals 
-                       if any(keyword in meal.lower() for keyword in comfort_keywords))
-    
-    return comfort_count >= len(liked_meals) * 0.3  # 30% or more comfort food
+    return PreferenceProfile(preferences).comfort_preference
 
 def get_preferred_price_range(preferences: Dict) -> Optional[Tuple[float, float]]:
-    """Determine user's preferred price range based on history"""
-    liked_meals = preferences.get('liked', [])
-    if not liked_meals:
-        return None
-    
-    # This is a simplified approach - in a real system, you'd look up actual prices
-    # For now, we'll estimate based on meal types
-    estimated_prices = []
-    for meal in liked_meals:
-        meal_name = meal.get('name', '') if isinstance(meal, dict) else str(meal)
-        meal_lower = meal_name.lower()
-        
-        # Estimate price based on meal type
-        if any(keyword in meal_lower for keyword in ['salmon', 'steak', 'premium']):
-            estimated_prices.append(18.0)
-        elif any(keyword in meal_lower for keyword in ['pizza', 'pasta', 'sandwich']):
-            estimated_prices.append(12.0)
-        elif any(keyword in meal_lower for keyword in ['salad', 'bowl', 'soup']):
-            estimated_prices.append(10.0)
-        else:
-            estimated_prices.append(13.0)
-    
-    if estimated_prices:
-        avg_price = sum(estimated_prices) / len(estimated_prices)
-        return (avg_price * 0.7, avg_price * 1.3)  # ±30% range
-    
-    return None
+    """Determine user's preferred price range based on (decayed) history"""
+    return PreferenceProfile(preferences).price_range
 
-def get_meal_recommendation_from_chatgpt(budget: float, preferences: Dict, available_meals: List) -> Optional[Dict]:
+def score_meals(meals: List, catalog: MealCatalog, preferences: Dict,
+                profile: PreferenceProfile) -> List[Tuple]:
     """
-    Get intelligent meal recommendation using advanced preference analysis + ChatGPT
-    
-    Args:
-        budget (float): User's budget for the meal
-        preferences (Dict): User's liked and disliked meals {"liked": [], "disliked": [], "neutral": []}
-        available_meals (List): List of available meals from meals.json
+    Score candidate meals: heuristic compatibility plus the collaborative filtering term
     
-    Returns:
-        Dict: Highly personalized meal recommendation
+    The CF term (dot product of the user's folded-in vector with each meal's
+    factors) is computed for all candidates in one vectorized pass when a
+    trained model is loaded.
     """
+    scored_meals = [(meal, calculate_meal_compatibility_score(meal, preferences, profile)) for meal in meals]
+    
+    cf_model = get_cf_model()
+    if cf_model is not None and meals:
+        cf_scores = cf_model.score_meals(preferences, catalog, meals)
+        if cf_scores is not None:
+            scored_meals = [(meal, score + CF_WEIGHT * cf_score)
+                            for (meal, score), cf_score in zip(scored_meals, cf_scores)]
+    return scored_meals
+
+def build_recommendation_prompt(budget: float, top_scored: List[Tuple], preferences: Dict,
+                                profile: PreferenceProfile) -> str:
+    """Build the ChatGPT prompt from the scored top candidates and the user's profile"""
+    
+    # 5. CREATE ADVANCED PROMPT FOR CHATGPT
+    context_parts = ["TOP RECOMMENDED MEALS based on user's preference analysis:\n"]
+    for i, (meal, score) in enumerate(top_scored):
+        context_parts.append(
+            f"\n{i+1}. {meal.get('name', 'Unknown')} (Compatibility Score: {score:.1f})\n"
+            f"   Price: ${meal.get('price', 0)} | Cuisine: {meal.get('cuisine_type', 'Unknown')}\n"
+            f"   Description: {meal.get('description', '')}\n"
+            f"   Ingredients: {', '.join(meal.get('ingredients', []))}\n"
+            f"   Category: {meal.get('category', 'Unknown')}\n"
+        )
+    meals_context = ''.join(context_parts)
     
-    try:
-        # 1. FILTER MEALS BY BUDGET
-        affordable_meals = [meal for meal in available_meals if meal.get('price', 0) <= budget]
-        
-        if not affordable_meals:
-            return get_fallback_recommendation(budget, preferences)
-        
-        # 2. CALCULATE COMPATIBILITY SCORES FOR ALL MEALS
-        scored_meals = []
-        for meal in affordable_meals:
-            score = calculate_meal_compatibility_score(meal, preferences)
-            scored_meals.append((meal, score))
-        
-        # 3. SORT BY SCORE (HIGHEST FIRST)
-        scored_meals.sort(key=lambda x: x[1], reverse=True)
-        
-        # 4. SELECT TOP CANDIDATES (Top 3-5 meals for ChatGPT to choose from)
-        top_candidates = [meal for meal, score in scored_meals[:5] if score > -100]
-        
-        if not top_candidates:
-            # If all meals have very low scores, take the best available
-            top_candidates = [scored_meals[0][0]] if scored_meals else affordable_meals[:3]
-        
-        # 5. CREATE ADVANCED PROMPT FOR CHATGPT
-        meals_context = "TOP RECOMMENDED MEALS based on user's preference analysis:\n"
-        
-        for i, meal in enumerate(top_candidates):
-            score = next((s for m, s in scored_meals if m == meal), 0)
-            meals_context += f"\n{i+1}. {meal.get('name', 'Unknown')} (Compatibility Score: {score:.1f})\n"
-            meals_context += f"   Price: ${meal.get('price', 0)} | Cuisine: {meal.get('cuisine_type', 'Unknown')}\n"
-            meals_context += f"   Description: {meal.get('description', '')}\n"
-            meals_context += f"   Ingredients: {', '.join(meal.get('ingredients', []))}\n"
-            meals_context += f"   Category: {meal.get('category', 'Unknown')}\n"
-        
-        # 6. ANALYZE USER PREFERENCES FOR CONTEXT
-        preference_analysis = analyze_user_preferences(preferences)
-        
-        # 7. BUILD INTELLIGENT PROMPT
-        prompt = f"""
+    # 6. ANALYZE USER PREFERENCES FOR CONTEXT
+    preference_analysis = analyze_user_preferences(preferences, profile)
+    
+    # 7. BUILD INTELLIGENT PROMPT
+    return f"""
 You are an AI sommelier and meal recommendation expert. Based on advanced preference analysis, I've identified the best meal matches for this user.
 
 USER PROFILE & BUDGET:
@@ -331,23 +474,82 @@ RESPONSE FORMAT (return valid JSON only):
 
 Select the meal that will make this user happiest based on their demonstrated preferences. Return only valid JSON.
         """
+
+def get_meal_recommendation_from_chatgpt(budget: float, preferences: Dict, available_meals: List) -> Optional[Dict]:
+    """
+    Get intelligent meal recommendation using advanced preference analysis + ChatGPT
+    
+    Args:
+        budget (float): User's budget for the meal
+        preferences (Dict): User's liked and disliked meals {"liked": [], "disliked": [], "neutral": []}
+        available_meals (MealCatalog | List): Meal catalog (or raw meal dicts from meals.json)
+    
+    Returns:
+        Dict: Highly personalized meal recommendation
+    """
+    
+    # Every path below except a validated LLM pick ends in the local scorer
+    set_response_source(RESPONSE_SOURCE_FALLBACK)
+    
+    try:
+        if not isinstance(available_meals, MealCatalog):
+            available_meals = MealCatalog(available_meals)
+        
+        # New users are served straight from the precomputed popularity ranking,
+        # before any pass over the catalog
+        if is_new_user(preferences):
+            popular_meals = get_popularity_table().top_for_budget(available_meals, budget)
+            if popular_meals:
+                set_response_source(RESPONSE_SOURCE_POPULARITY)
+                recommendation = popular_meals[0].to_dict()
+                recommendation['recommendation_reason'] = "One of the most popular meals with other diners within your budget"
+                return recommendation
+        
+        # 1. FILTER MEALS BY BUDGET
+        with profile_stage('filter_budget'):
+            affordable_meals = available_meals.affordable(budget)
+        
+        if not affordable_meals:
+            return get_fallback_recommendation(budget, preferences)
+        
+        # 2. CALCULATE COMPATIBILITY SCORES FOR ALL MEALS
+        with profile_stage('preference_profile'):
+            profile = PreferenceProfile(preferences)  # Aggregate the history once, not per meal
+        with profile_stage('scoring'):
+            scored_meals = score_meals(affordable_meals, available_meals, preferences, profile)
+            
+            # 3. SORT BY SCORE (HIGHEST FIRST)
+            scored_meals.sort(key=lambda x: x[1], reverse=True)
+        
+        # 4. SELECT TOP CANDIDATES (Top 3-5 meals for ChatGPT to choose from)
+        top_scored = [(meal, score) for meal, score in scored_meals[:5] if score > -100]
+        
+        if not top_scored:
+            # If all meals have very low scores, take the best available
+            top_scored = scored_meals[:1]
+        top_candidates = [meal for meal, score in top_scored]
+        
+        # 5-7. BUILD INTELLIGENT PROMPT
+        with profile_stage('prompt'):
+            prompt = build_recommendation_prompt(budget, top_scored, preferences, profile)
         
         # 8. CALL CHATGPT API
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "You are an expert meal recommendation AI that understands user preferences deeply and selects meals that will delight users. Respond only in valid JSON format."
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ],
-            max_tokens=600,
-            temperature=0.3  # Lower temperature for more consistent, preference-based recommendations
-        )
+        with profile_stage('llm_call'):
+            response = get_openai_client().ChatCompletion.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {
+                        "role": "system", 
+                        "content": "You are an expert meal recommendation AI that understands user preferences deeply and selects meals that will delight users. Respond only in valid JSON format."
+                    },
+                    {
+                        "role": "user", 
+                        "content": prompt
+                    }
+                ],
+                max_tokens=600,
+                temperature=0.3  # Lower temperature for more consistent, preference-based recommendations
+            )
         
         # 9. PARSE AND VALIDATE RESPONSE
         chatgpt_response = response.choices[0].message.content.strip()
@@ -360,67 +562,79 @@ Select the meal that will make this user happiest based on their demonstrated pr
             valid_meal = None
             
             for meal in top_candidates:
-                if meal.get('name', '') == recommended_meal_name:
-                    valid_meal = meal.copy()
+                if meal.name == recommended_meal_name:
+                    valid_meal = meal.to_dict()
                     # Add the recommendation reason if provided
                     if 'recommendation_reason' in recommendation:
                         valid_meal['recommendation_reason'] = recommendation['recommendation_reason']
                     break
             
             if valid_meal:
+                set_response_source(RESPONSE_SOURCE_LLM)
                 return valid_meal
             else:
                 print(f"ChatGPT recommended meal not in top candidates: {recommended_meal_name}")
                 # Return the highest scored meal as fallback
-                return scored_meals[0][0] if scored_meals else get_fallback_recommendation(budget, preferences)
+                return scored_meals[0][0].to_dict() if scored_meals else get_fallback_recommendation(budget, preferences)
                 
         except json.JSONDecodeError as e:
             print(f"Failed to parse ChatGPT JSON response: {e}")
             print(f"Raw response: {chatgpt_response}")
             # Return the highest scored meal as fallback
-            return scored_meals[0][0] if scored_meals else get_fallback_recommendation(budget, preferences)
+            return scored_meals[0][0].to_dict() if scored_meals else get_fallback_recommendation(budget, preferences)
             
     except Exception as e:
         print(f"ChatGPT API error: {e}")
         return get_fallback_recommendation(budget, preferences)
 
-def analyze_user_preferences(preferences: Dict) -> str:
+# Only the most recent ratings are named in the prompt; older ones are summarized
+PROMPT_MAX_MEAL_NAMES = 10
+
+def format_recent_meals(entries: List) -> str:
+    """Comma-separated names of the most recent entries, noting how many were left out"""
+    names = recent_names(entries, PROMPT_MAX_MEAL_NAMES)
+    hidden = len(entries) - len(names)
+    return ', '.join(names) + (f" (+{hidden} earlier)" if hidden > 0 else "")
+
+def analyze_user_preferences(preferences: Dict, profile: Optional[PreferenceProfile] = None) -> str:
     """Generate a detailed analysis of user preferences for the ChatGPT prompt"""
     
-    liked_meals = extract_meal_names(preferences.get('liked', []))
-    disliked_meals = extract_meal_names(preferences.get('disliked', []))
-    neutral_meals = extract_meal_names(preferences.get('neutral', []))
+    if profile is None:
+        profile = PreferenceProfile(preferences)
+    liked_meals = preferences.get('liked', [])
+    disliked_meals = preferences.get('disliked', [])
+    neutral_meals = preferences.get('neutral', [])
     
     analysis_parts = []
     
     # Preference summary
     if liked_meals:
-        analysis_parts.append(f"Previously liked meals: {', '.join(liked_meals)}")
+        analysis_parts.append(f"Previously liked meals: {format_recent_meals(liked_meals)}")
     else:
         analysis_parts.append("New user with no previous likes")
     
     if disliked_meals:
-        analysis_parts.append(f"Previously disliked meals: {', '.join(disliked_meals)}")
+        analysis_parts.append(f"Previously disliked meals: {format_recent_meals(disliked_meals)}")
     
     if neutral_meals:
-        analysis_parts.append(f"Neutral about: {', '.join(neutral_meals)}")
+        analysis_parts.append(f"Neutral about: {format_recent_meals(neutral_meals)}")
     
-    # Cuisine preferences
-    liked_cuisines = get_cuisines_from_meals(preferences.get('liked', []))
-    if liked_cuisines:
-        cuisine_counts = Counter(liked_cuisines)
-        top_cuisines = [f"{cuisine} ({count}x)" for cuisine, count in cuisine_counts.most_common(3)]
-        analysis_parts.append(f"Preferred cuisines: {', '.join(top_cuisines)}")
+    # Cuisine preferences (time-decayed weights, recent ratings count most)
+    top_cuisines = profile.top_cuisines('liked', 3)
+    if top_cuisines:
+        # Whole weights print as before ("italian (2x)"); decayed ones keep one decimal
+        cuisine_weights = [f"{cuisine} ({round(weight, 1):g}x)" for cuisine, weight in top_cuisines]
+        analysis_parts.append(f"Preferred cuisines: {', '.join(cuisine_weights)}")
     
     # Dietary patterns
-    if has_healthy_preference(preferences):
+    if profile.healthy_preference:
         analysis_parts.append("Shows preference for healthy/nutritious options")
     
-    if has_comfort_food_preference(preferences):
+    if profile.comfort_preference:
         analysis_parts.append("Shows preference for comfort food")
     
     # Price preferences
-    price_range = get_preferred_price_range(preferences)
+    price_range = profile.price_range
     if price_range:
         min_price, max_price = price_range
         analysis_parts.append(f"Typical price range: ${min_price:.2f} - ${max_price:.2f}")
@@ -432,39 +646,32 @@ def get_fallback_recommendation(budget: float, preferences: Dict) -> Dict:
     Intelligent fallback recommendation using the same scoring algorithm
     """
     
-    # Import here to avoid circular imports
-    import os
-    
-    # Load meals from meals.json
+    # Load meals from meals.json (cached catalog, reloaded only when the file changes)
     meals_file_path = '../data/meals.json'
     try:
-        if os.path.exists(meals_file_path):
-            with open(meals_file_path, 'r') as file:
-                available_meals = json.load(file)
-        else:
-            available_meals = get_predefined_fallback_meals()
+        available_meals = get_cached_catalog(meals_file_path)
+        if not len(available_meals):
+            available_meals = MealCatalog(get_predefined_fallback_meals())
     except Exception as e:
         print(f"Error loading meals.json: {e}")
-        available_meals = get_predefined_fallback_meals()
+        available_meals = MealCatalog(get_predefined_fallback_meals())
     
     # Filter meals that fit the budget
-    affordable_meals = [meal for meal in available_meals if meal.get('price', 0) <= budget]
+    affordable_meals = available_meals.affordable(budget)
     
     if not affordable_meals:
-        if available_meals:
-            return min(available_meals, key=lambda x: x.get('price', 0))
+        if len(available_meals):
+            return min(available_meals, key=lambda x: x.price).to_dict()
         else:
             return get_predefined_fallback_meals()[0]
     
     # Use the same scoring algorithm
-    scored_meals = []
-    for meal in affordable_meals:
-        score = calculate_meal_compatibility_score(meal, preferences)
-        scored_meals.append((meal, score))
+    profile = PreferenceProfile(preferences)
+    scored_meals = score_meals(affordable_meals, available_meals, preferences, profile)
     
     # Return the highest scored meal
     scored_meals.sort(key=lambda x: x[1], reverse=True)
-    return scored_meals[0][0]
+    return scored_meals[0][0].to_dict()
 
 def get_predefined_fallback_meals():
     """Get predefined fallback meals in case meals.json is not available"""
@@ -503,7 +710,7 @@ def get_predefined_fallback_meals():
 def test_chatgpt_connection():
     """Test if ChatGPT API is working"""
     try:
-        response = openai.ChatCompletion.create(
+        response = get_openai_client().ChatCompletion.create(
             model="gpt-3.5-turbo",
             messages=[{"role": "user", "content": "Hello, respond with 'API working'"}],
             max_tokens=10
@@ -515,6 +722,7 @@ def test_chatgpt_connection():
 
 def validate_api_key():
     """Validate if API key is properly configured"""
+    get_openai_client()
     if not OPENAI_API_KEY or OPENAI_API_KEY == os.getenv("OPENAI_API_KEY"):
         print("⚠️  WARNING: OpenAI API key not configured!")
         print("📝 Please add your API key in chatgpt_service.py")
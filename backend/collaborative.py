@@ -0,0 +1,139 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from preference_history import PREFERENCE_CATEGORIES, decay_weight, entry_name
+
+# ===== COLLABORATIVE FILTERING (MATRIX FACTORIZATION) =====
+# train_cf.py fits low-rank user/meal factors offline with ALS and writes them
+# as .npy files. Serving memory-maps the meal factors (no copy) and folds each
+# request's user in from their current ratings, so new ratings count
+# immediately without retraining. NumPy is imported only when a model is
+# actually loaded, so workers without one never pay for it.
+
+DEFAULT_CF_MODEL_DIR = '../data/cf_model'
+RATING_VALUES = {'liked': 1.0, 'disliked': -1.0, 'neutral': 0.0}
+DEFAULT_REGULARIZATION = 0.1
+
+USER_FACTORS_FILE = 'user_factors.npy'
+MEAL_FACTORS_FILE = 'meal_factors.npy'
+INDEX_FILE = 'index.json'
+
+_numpy = None
+
+
+def get_numpy():
+    """Import NumPy on first use (raises ImportError if it isn't installed)"""
+    global _numpy
+    if _numpy is None:
+        import numpy
+        _numpy = numpy
+    return _numpy
+
+
+def preference_ratings(preferences: Dict, now: Optional[float] = None) -> List[Tuple[str, float, float]]:
+    """(meal_name, rating value, time-decay weight) for every raw rating of a user"""
+    now = time.time() if now is None else now
+    ratings = []
+    for category in PREFERENCE_CATEGORIES:
+        for entry in preferences.get(category, []):
+            name = entry_name(entry)
+            if name:
+                rated_at = entry.get('rated_at') if isinstance(entry, dict) else None
+                ratings.append((name, RATING_VALUES[category], decay_weight(rated_at, now)))
+    return ratings
+
+
+def solve_factors(factors, values, weights, regularization: float):
+    """Weighted ridge solve for one row: argmin_x sum w*(f.x - r)^2 + reg*|x|^2"""
+    np = get_numpy()
+    weighted = factors.T * weights
+    gram = weighted @ factors + regularization * np.eye(factors.shape[1])
+    return np.linalg.solve(gram, weighted @ values)
+
+
+class CFModel:
+    """Memory-mapped meal factors plus the name -> column index"""
+
+    def __init__(self, model_dir: str):
+        np = get_numpy()
+        with open(os.path.join(model_dir, INDEX_FILE), 'r') as file:
+            index = json.load(file)
+        self.meal_names: List[str] = index['meal_names']
+        self.columns: Dict[str, int] = {name: col for col, name in enumerate(self.meal_names)}
+        self.rank: int = index['rank']
+        self.regularization: float = index.get('regularization', DEFAULT_REGULARIZATION)
+        self.trained_at = index.get('trained_at')
+        # Read-only memory maps: pages are shared between workers, nothing is copied
+        self.meal_factors = np.load(os.path.join(model_dir, MEAL_FACTORS_FILE), mmap_mode='r')
+        self._aligned = (None, None)  # (catalog, factors), replaced in one assignment
+
+    def fold_in(self, preferences: Dict):
+        """User vector from current ratings against the fixed meal factors (None if no overlap)"""
+        cols, values, weights = [], [], []
+        for name, value, weight in preference_ratings(preferences):
+            col = self.columns.get(name)
+            if col is not None:
+                cols.append(col)
+                values.append(value)
+                weights.append(weight)
+        if not cols:
+            return None
+        np = get_numpy()
+        factors = np.asarray(self.meal_factors[cols], dtype=np.float64)
+        return solve_factors(factors, np.array(values), np.array(weights), self.regularization)
+
+    def catalog_factors(self, catalog):
+        """Meal factors in catalog order (zero rows for meals the model has never seen)"""
+        aligned_catalog, aligned = self._aligned
+        if aligned_catalog is not catalog:
+            names = [meal.name for meal in catalog.meals]
+            if names == self.meal_names:
+                aligned = self.meal_factors  # Same order as training: use the mmap directly
+            else:
+                aligned = get_numpy().zeros((len(names), self.rank), dtype=self.meal_factors.dtype)
+                for position, name in enumerate(names):
+                    col = self.columns.get(name)
+                    if col is not None:
+                        aligned[position] = self.meal_factors[col]
+            # Readers on other threads see either the old pair or the new one, never a mix
+            self._aligned = (catalog, aligned)
+        return aligned
+
+    def score_meals(self, preferences: Dict, catalog, meals) -> Optional[List[float]]:
+        """CF term for each of `meals` (records of `catalog`) in one vectorized pass"""
+        user_vector = self.fold_in(preferences)
+        if user_vector is None:
+            return None
+        np = get_numpy()
+        positions = np.fromiter((meal.index for meal in meals), dtype=np.intp, count=len(meals))
+        return (self.catalog_factors(catalog)[positions] @ user_vector).tolist()
+
+
+def load_cf_model(model_dir: str = DEFAULT_CF_MODEL_DIR) -> Optional[CFModel]:
+    """Load a trained model if the model files exist and NumPy is available"""
+    if not os.path.exists(os.path.join(model_dir, INDEX_FILE)):
+        return None
+    try:
+        get_numpy()
+    except ImportError:  # Collaborative filtering is optional; scoring works without it
+        print(f"NumPy is not installed; ignoring collaborative filtering model in {model_dir}")
+        return None
+    try:
+        return CFModel(model_dir)
+    except Exception as e:
+        print(f"Could not load collaborative filtering model from {model_dir}: {e}")
+        return None
+
+
+_cf_model: Optional[CFModel] = None
+
+
+def install_cf_model(model: Optional[CFModel]):
+    global _cf_model
+    _cf_model = model
+
+
+def get_cf_model() -> Optional[CFModel]:
+    return _cf_model
@@ -0,0 +1,171 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+from flask import Response, request
+
+# ===== HTTP CACHING HELPERS =====
+# Versioned ETags, If-None-Match -> 304, and gzip bodies compressed once per
+# version instead of once per request.
+
+GZIP_MIN_SIZE = 1024  # Smaller payloads aren't worth the Content-Encoding overhead
+GZIP_LEVEL = 6
+# Local script/stylesheet references in HTML pages, versioned as ?v=<content hash>
+ASSET_REFERENCE = re.compile(r'(\b(?:src|href)=")([^"?#:]+\.(?:js|css))(")')
+
+
+class CachedBody:
+    """A serialized response body with a lazily built gzip variant"""
+
+    __slots__ = ('data', 'mimetype', '_gzipped')
+
+    def __init__(self, data: bytes, mimetype: str = 'application/json'):
+        self.data = data
+        self.mimetype = mimetype
+        self._gzipped: Optional[bytes] = None
+
+    @property
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.data, GZIP_LEVEL, mtime=0)
+        return self._gzipped
+
+
+class BodyCache:
+    """Thread-safe LRU of serialized bodies, bounded so worker memory stays flat"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version) -> Optional[CachedBody]:
+        """The cached body for key if it was stored for this version"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, version, body: CachedBody):
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def etag_matches(etag: str) -> bool:
+    """True if the request's If-None-Match covers this ETag"""
+    header = request.headers.get('If-None-Match', '')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag in candidates
+
+
+def client_accepts_gzip() -> bool:
+    return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+
+def not_modified_response(etag: str, cache_control: str) -> Response:
+    response = Response(status=304)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = cache_control
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def cached_response(body: CachedBody, etag: str, cache_control: str) -> Response:
+    """Serve body with its ETag, gzip-encoded when the client accepts it and it is large enough"""
+    if request.method in ('GET', 'HEAD') and etag_matches(etag):
+        return not_modified_response(etag, cache_control)
+
+    if len(body.data) >= GZIP_MIN_SIZE and client_accepts_gzip():
+        response = Response(body.gzipped, mimetype=body.mimetype)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(body.data, mimetype=body.mimetype)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = cache_control
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def asset_version(etag: str) -> str:
+    """The ?v= value for an asset with this ETag"""
+    return etag.strip('"')
+
+
+class StaticAssetCache:
+    """Serves files from a directory with content ETags and in-memory gzip variants"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._entries: Dict[str, Tuple[float, str, CachedBody]] = {}
+        self._pages: Dict[str, Tuple] = {}
+
+    def resolve(self, relative_path: str) -> Optional[str]:
+        """Absolute path inside root, or None for missing files and path traversal"""
+        path = os.path.abspath(os.path.join(self.root, relative_path))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def get(self, path: str) -> Tuple[str, CachedBody]:
+        """(etag, body) for a resolved path, reloaded only when the file changes"""
+        mtime = os.path.getmtime(path)
+        entry = self._entries.get(path)
+        if entry and entry[0] == mtime:
+            return entry[1], entry[2]
+        with open(path, 'rb') as file:
+            data = file.read()
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        etag = f'"{hashlib.sha1(data).hexdigest()[:16]}"'
+        body = CachedBody(data, mimetype)
+        self._entries[path] = (mtime, etag, body)
+        return etag, body
+
+    def get_page(self, path: str) -> Tuple[str, CachedBody]:
+        """(etag, body) for an HTML page whose local .js/.css links carry ?v=<content hash>
+
+        The rewritten page changes whenever the page or any asset it links changes,
+        so assets requested with a matching v= can be cached indefinitely.
+        """
+        page_etag, page_body = self.get(path)
+        entry = self._pages.get(path)
+        if entry is None or entry[0] != page_etag:
+            page_dir = os.path.dirname(path)
+            references = {}
+            for _, reference, _ in ASSET_REFERENCE.findall(page_body.data.decode('utf-8')):
+                asset_path = self.resolve(os.path.relpath(os.path.join(page_dir, reference), self.root))
+                if asset_path:
+                    references[reference] = asset_path
+            entry = (page_etag, references, None, None, None)
+
+        versions = tuple(asset_version(self.get(asset_path)[0]) for asset_path in entry[1].values())
+        if entry[2] != versions:
+            version_of = dict(zip(entry[1], versions))
+
+            def versioned(match):
+                version = version_of.get(match.group(2))
+                if version is None:
+                    return match.group(0)
+                return f"{match.group(1)}{match.group(2)}?v={version}{match.group(3)}"
+
+            data = ASSET_REFERENCE.sub(versioned, page_body.data.decode('utf-8')).encode('utf-8')
+            etag = f'"{hashlib.sha1(data).hexdigest()[:16]}"'
+            entry = (page_etag, entry[1], versions, etag, CachedBody(data, page_body.mimetype))
+        self._pages[path] = entry
+        return entry[3], entry[4]
@@ -0,0 +1,33 @@
+import re
+from typing import Dict, List, Optional
+
+# ===== PRECOMPILED KEYWORD MATCHING =====
+# The preference heuristics test meal names against fixed keyword tables.
+# Each label's keywords are compiled once into a single alternation regex,
+# so a lookup is one scan per label instead of one `in` test per keyword.
+
+
+class KeywordMatcher:
+    """Substring matcher over an ordered {label: [keywords]} table"""
+
+    __slots__ = ('labels', 'patterns')
+
+    def __init__(self, table: Dict[str, List[str]]):
+        self.labels = list(table.keys())
+        self.patterns = [re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+                         for keywords in table.values()]
+
+    def first(self, text: str) -> Optional[str]:
+        """First label (in table order) with a keyword contained in text"""
+        for label, pattern in zip(self.labels, self.patterns):
+            if pattern.search(text):
+                return label
+        return None
+
+    def all(self, text: str) -> List[str]:
+        """Every label (in table order) with a keyword contained in text"""
+        return [label for label, pattern in zip(self.labels, self.patterns) if pattern.search(text)]
+
+    def any(self, text: str) -> bool:
+        """True if any keyword of any label is contained in text"""
+        return any(pattern.search(text) for pattern in self.patterns)
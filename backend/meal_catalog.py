@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# ===== COMPACT MEAL CATALOG =====
+# Meals are loaded once into slot-based records. Cuisines, categories and
+# ingredients are interned to small integer ids, and their lowercase forms are
+# computed a single time at load so the scoring path never re-normalizes them.
+
+MEAL_FIELDS = ('id', 'name', 'description', 'price', 'cuisine_type', 'ingredients', 'category')
+
+
+class InternTable:
+    """Maps repeated strings to small integer ids, keeping display and lowercase forms"""
+
+    __slots__ = ('ids', 'values', 'lowered')
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+        self.lowered: List[str] = []
+
+    def intern(self, value: str) -> int:
+        """Return the id for value, registering it on first sight"""
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            self.ids[value] = value_id
+            self.values.append(value)
+            self.lowered.append(value.lower())
+        return value_id
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class MealRecord:
+    """A single menu item with interned cuisine, category and ingredients"""
+
+    __slots__ = ('id', 'name', 'name_lower', 'description', 'price',
+                 'cuisine_id', 'category_id', 'ingredient_ids', 'extras', 'catalog', 'index')
+
+    def __init__(self, catalog: 'MealCatalog', meal: Dict):
+        self.catalog = catalog
+        self.index = len(catalog.meals)  # Position in the catalog (row in per-meal arrays)
+        self.id = meal.get('id')
+        self.name = meal.get('name', '')
+        self.name_lower = self.name.lower()
+        self.description = meal.get('description', '')
+        self.price = meal.get('price', 0)
+        self.cuisine_id = catalog.cuisines.intern(meal.get('cuisine_type', ''))
+        self.category_id = catalog.categories.intern(meal.get('category', ''))
+        self.ingredient_ids = tuple(catalog.ingredients.intern(ing) for ing in meal.get('ingredients', []))
+        extras = {key: value for key, value in meal.items() if key not in MEAL_FIELDS}
+        self.extras = extras or None
+
+    # Lowercase views used by the scoring path
+    @property
+    def cuisine(self) -> str:
+        return self.catalog.cuisines.lowered[self.cuisine_id]
+
+    @property
+    def category(self) -> str:
+        return self.catalog.categories.lowered[self.category_id]
+
+    @property
+    def ingredients(self) -> List[str]:
+        return list(map(self.catalog.ingredients.lowered.__getitem__, self.ingredient_ids))
+
+    def get(self, key: str, default=None):
+        """Dict-style access returning the original JSON values"""
+        if key == 'cuisine_type':
+            return self.catalog.cuisines.values[self.cuisine_id]
+        if key == 'category':
+            return self.catalog.categories.values[self.category_id]
+        if key == 'ingredients':
+            values = self.catalog.ingredients.values
+            return [values[ing_id] for ing_id in self.ingredient_ids]
+        if key in ('id', 'name', 'description', 'price'):
+            return getattr(self, key)
+        if self.extras:
+            return self.extras.get(key, default)
+        return default
+
+    def to_dict(self) -> Dict:
+        """Convert back to the meals.json shape (used at the API boundary)"""
+        meal = {field: self.get(field) for field in MEAL_FIELDS}
+        if self.extras:
+            meal.update(self.extras)
+        return meal
+
+    def __repr__(self) -> str:
+        return f"MealRecord(id={self.id!r}, name={self.name!r})"
+
+
+class MealCatalog:
+    """In-memory menu made of MealRecords plus the shared intern tables"""
+
+    def __init__(self, meals: Optional[List[Dict]] = None, version: Optional[str] = None):
+        self.version = version  # Content hash of the source file, used for menu ETags
+        self.cuisines = InternTable()
+        self.categories = InternTable()
+        self.ingredients = InternTable()
+        self.meals: List[MealRecord] = []
+        for meal in meals or []:
+            self.add(meal)
+
+    def add(self, meal: Dict) -> MealRecord:
+        """Intern a meal dict and append it to the catalog"""
+        record = MealRecord(self, meal)
+        self.meals.append(record)
+        return record
+
+    def affordable(self, budget: float) -> List[MealRecord]:
+        """Meals whose price fits within the budget"""
+        return [meal for meal in self.meals if meal.price <= budget]
+
+    def to_dicts(self) -> List[Dict]:
+        return [meal.to_dict() for meal in self.meals]
+
+    def __iter__(self) -> Iterator[MealRecord]:
+        return iter(self.meals)
+
+    def __len__(self) -> int:
+        return len(self.meals)
+
+    def __getitem__(self, index):
+        return self.meals[index]
+
+
+def load_meal_catalog(filepath: str) -> MealCatalog:
+    """Load meals.json into a MealCatalog (empty catalog if the file is missing)"""
+    if not os.path.exists(filepath):
+        return MealCatalog(version='empty')
+    with open(filepath, 'rb') as file:
+        raw = file.read()
+    return MealCatalog(json.loads(raw), version=content_version(raw))
+
+
+def content_version(raw: bytes) -> str:
+    """Catalog version for a meals.json payload (content hash)"""
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def file_content_version(filepath: str) -> str:
+    """Version load_meal_catalog would assign to filepath, without parsing it"""
+    if not os.path.exists(filepath):
+        return 'empty'
+    with open(filepath, 'rb') as file:
+        return content_version(file.read())
+
+
+def as_meal_record(meal) -> MealRecord:
+    """Accept either a MealRecord or a raw meal dict"""
+    if isinstance(meal, MealRecord):
+        return meal
+    return MealCatalog([meal]).meals[0]
+
+
+_catalog_cache: Dict[str, Tuple[float, MealCatalog]] = {}
+
+
+def prime_catalog_cache(filepath: str, catalog: MealCatalog, mtime: float):
+    """Seed the cache with a catalog built elsewhere (e.g. at app startup)"""
+    _catalog_cache[filepath] = (mtime, catalog)
+
+
+def get_cached_catalog(filepath: str) -> MealCatalog:
+    """Load a catalog once and reuse it until the file on disk changes"""
+    try:
+        mtime = os.path.getmtime(filepath)
+    except OSError:
+        mtime = -1.0
+    cached = _catalog_cache.get(filepath)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    catalog = load_meal_catalog(filepath)
+    _catalog_cache[filepath] = (mtime, catalog)
+    return catalog
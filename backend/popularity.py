@@ -0,0 +1,181 @@
+import bisect
+import threading
+from typing import Dict, List, Optional
+
+from preference_history import folded_ratings
+
+# ===== GLOBAL MEAL POPULARITY =====
+# Aggregate like/dislike/neutral counts per meal, updated incrementally by
+# rating events. From them we keep a budget-indexed popularity ranking: meals
+# sorted by price in a segment tree whose nodes hold the top-K most popular
+# meals of their range. "Best meals under $X" for a new user is a bisect plus
+# a merge of O(log n) nodes, and a rating re-ranks only the rated meal.
+
+RATINGS = ('like', 'dislike', 'neutral')
+CATEGORY_TO_RATING = {'liked': 'like', 'disliked': 'dislike', 'neutral': 'neutral'}
+
+# Beta prior: an unrated meal sits at 0.5. Cuisines that used to be hard-coded
+# as "popular" for new users get extra pseudo-likes until real ratings arrive
+# (new-user ranking only; existing users see the data-only prior).
+PRIOR_LIKES = 1.0
+PRIOR_DISLIKES = 1.0
+SEED_POPULAR_CUISINES = ['italian', 'american', 'mexican']
+SEED_LIKES = 2.0
+NEUTRAL_WEIGHT = 0.5  # A neutral rating counts as half a like
+
+
+class MealRatingCounters:
+    """Per-meal {like, dislike, neutral} counts across all users"""
+
+    def __init__(self, counts: Optional[Dict[str, Dict[str, int]]] = None):
+        self.counts: Dict[str, Dict[str, int]] = {}
+        for name, meal_counts in (counts or {}).items():
+            self.counts[name] = {rating: int(meal_counts.get(rating, 0)) for rating in RATINGS}
+
+    def get(self, meal_name: str) -> Dict[str, int]:
+        return self.counts.get(meal_name) or {rating: 0 for rating in RATINGS}
+
+    def apply(self, meal_name: str, old_rating: Optional[str], new_rating: Optional[str]):
+        """Move one user's rating of a meal from old_rating to new_rating (either may be None)"""
+        if old_rating == new_rating:
+            return
+        meal_counts = self.counts.setdefault(meal_name, {rating: 0 for rating in RATINGS})
+        if old_rating in RATINGS:
+            meal_counts[old_rating] = max(meal_counts[old_rating] - 1, 0)
+        if new_rating in RATINGS:
+            meal_counts[new_rating] += 1
+
+    def to_dict(self) -> Dict[str, Dict[str, int]]:
+        return {name: dict(meal_counts) for name, meal_counts in self.counts.items()}
+
+    @classmethod
+    def from_preferences(cls, all_preferences: Dict) -> 'MealRatingCounters':
+        """Rebuild the counters from every user's stored preference lists"""
+        counters = cls()
+        for user_prefs in (all_preferences or {}).values():
+            for category, rating in CATEGORY_TO_RATING.items():
+                for item in user_prefs.get(category, []):
+                    name = item.get('name', '') if isinstance(item, dict) else str(item)
+                    if name:
+                        counters.apply(name, None, rating)
+            # Ratings folded out of the raw history still count
+            for name, category in folded_ratings(user_prefs).items():
+                counters.apply(name, None, CATEGORY_TO_RATING.get(category))
+        return counters
+
+
+class PopularityTable:
+    """Popularity prior per meal plus a budget-indexed top-K ranking"""
+
+    def __init__(self, counters: Optional[MealRatingCounters] = None, top_k: int = 5):
+        self.counters = counters or MealRatingCounters()
+        self.top_k = top_k
+        self._catalog = None
+        self._prices: List[float] = []
+        self._positions: Dict[str, int] = {}  # meal name -> index in price order
+        self._meals: List = []  # Catalog records in price order
+        self._size = 0
+        # Segment tree over price order; each node holds the top-K (-prior, position) of its range
+        self._tree: List[List] = []
+        self._lock = threading.Lock()
+
+    def prior(self, meal) -> float:
+        """Smoothed like-rate in [0, 1] from real ratings only (0.5 = no signal)"""
+        return self._like_rate(meal, 0.0)
+
+    def seeded_prior(self, meal) -> float:
+        """Prior used to rank meals for new users: seed cuisines start ahead until ratings arrive"""
+        return self._like_rate(meal, SEED_LIKES if meal.cuisine in SEED_POPULAR_CUISINES else 0.0)
+
+    def _like_rate(self, meal, seed_likes: float) -> float:
+        meal_counts = self.counters.get(meal.name)
+        likes = PRIOR_LIKES + seed_likes + meal_counts['like'] + NEUTRAL_WEIGHT * meal_counts['neutral']
+        dislikes = PRIOR_DISLIKES + meal_counts['dislike'] + NEUTRAL_WEIGHT * meal_counts['neutral']
+        return likes / (likes + dislikes)
+
+    def sync_counts(self, counts: Dict[str, Dict[str, int]]):
+        """Adopt persisted counts for the given meals (picks up other workers' ratings)"""
+        with self._lock:
+            for meal_name, meal_counts in counts.items():
+                self.counters.counts[meal_name] = {rating: int(meal_counts.get(rating, 0)) for rating in RATINGS}
+                self._update(meal_name)
+
+    def sync_all(self, counters: MealRatingCounters):
+        """Adopt a full set of persisted counters, re-ranking only meals whose counts changed"""
+        with self._lock:
+            empty = {rating: 0 for rating in RATINGS}
+            changed = [name for name in set(counters.counts) | set(self.counters.counts)
+                       if counters.counts.get(name, empty) != self.counters.counts.get(name, empty)]
+            for meal_name in changed:
+                self.counters.counts[meal_name] = dict(counters.get(meal_name))
+                self._update(meal_name)
+
+    def _merge(self, left: List, right: List) -> List:
+        return sorted(left + right)[:self.top_k]
+
+    def _rebuild(self, catalog):
+        """Full build, only needed when the catalog itself changes"""
+        ordered = sorted(catalog.meals, key=lambda meal: meal.price)
+        size = 1
+        while size < len(ordered):
+            size *= 2
+        tree: List[List] = [[] for _ in range(2 * size)]
+        for position, meal in enumerate(ordered):
+            tree[size + position] = [(-self.seeded_prior(meal), position)]
+        for node in range(size - 1, 0, -1):
+            tree[node] = self._merge(tree[2 * node], tree[2 * node + 1])
+        self._catalog = catalog
+        self._meals = ordered
+        self._prices = [meal.price for meal in ordered]
+        self._positions = {meal.name: position for position, meal in enumerate(ordered)}
+        self._size = size
+        self._tree = tree
+
+    def _update(self, meal_name: str):
+        """Recompute one meal's leaf and its ancestors: O(K log n)"""
+        position = self._positions.get(meal_name)
+        if position is None:
+            return
+        tree = self._tree
+        node = self._size + position
+        tree[node] = [(-self.seeded_prior(self._meals[position]), position)]
+        node //= 2
+        while node:
+            tree[node] = self._merge(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+
+    def top_for_budget(self, catalog, budget: float) -> List:
+        """Most popular meals (best first) with price <= budget"""
+        with self._lock:
+            if catalog is not self._catalog:
+                self._rebuild(catalog)
+            count = bisect.bisect_right(self._prices, budget)
+            # Merge the nodes covering positions [0, count)
+            top: List = []
+            low, high = self._size, self._size + count
+            while low < high:
+                if low & 1:
+                    top = self._merge(top, self._tree[low])
+                    low += 1
+                if high & 1:
+                    high -= 1
+                    top = self._merge(top, self._tree[high])
+                low //= 2
+                high //= 2
+            return [self._meals[position] for _, position in top]
+
+
+_popularity_table: Optional[PopularityTable] = None
+
+
+def install_popularity_table(table: PopularityTable):
+    global _popularity_table
+    _popularity_table = table
+
+
+def get_popularity_table() -> PopularityTable:
+    """The process-wide table (an empty, prior-only table until one is installed)"""
+    global _popularity_table
+    if _popularity_table is None:
+        _popularity_table = PopularityTable()
+    return _popularity_table
@@ -0,0 +1,169 @@
+"""
+Time-decayed, size-bounded preference history
+
+Ratings are stored as {"name", "price", "rated_at"} entries. Each category keeps
+at most MAX_HISTORY_PER_CATEGORY raw entries; older ones are folded into a
+per-user "summary" of decayed feature counters (cuisine, category, ingredients,
+...), so scoring cost and prompt size stay flat as users rate thousands of meals.
+The summary also keeps a compact {name: [category, rated_at]} map of folded
+entries, so a folded rating can still be matched, changed, removed and counted.
+Every weight decays exponentially with a half-life of PREFERENCE_HALF_LIFE_DAYS.
+
+Usage:
+    python preference_history.py migrate [PREFERENCES_FILE]
+"""
+
+import json
+import math
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+PREFERENCE_CATEGORIES = ('liked', 'disliked', 'neutral')
+MAX_HISTORY_PER_CATEGORY = 50
+PREFERENCE_HALF_LIFE_DAYS = 90.0
+
+_DECAY_RATE = math.log(2) / (PREFERENCE_HALF_LIFE_DAYS * 86400)
+
+
+def decay_weight(rated_at: Optional[float], now: float) -> float:
+    """Weight of a rating made at rated_at, as seen at now (1.0 = just rated)"""
+    if rated_at is None:
+        return 1.0
+    return math.exp(-_DECAY_RATE * max(now - rated_at, 0.0))
+
+
+def entry_name(entry) -> str:
+    return entry.get('name', '') if isinstance(entry, dict) else str(entry)
+
+
+def normalize_entry(entry, now: float) -> Optional[Dict]:
+    """Turn a bare string or {"name", "price"} dict into a timestamped entry"""
+    name = entry_name(entry)
+    if not name:
+        return None
+    normalized = dict(entry) if isinstance(entry, dict) else {"name": name, "price": 0}
+    normalized.setdefault('price', 0)
+    normalized.setdefault('rated_at', now)
+    return normalized
+
+
+def empty_summary(now: float) -> Dict:
+    return {"updated_at": now, "counters": {category: {} for category in PREFERENCE_CATEGORIES}, "folded": {}}
+
+
+def decay_summary(summary: Optional[Dict], now: float) -> Dict:
+    """Return the summary counters decayed forward to now"""
+    if not summary:
+        return empty_summary(now)
+    factor = decay_weight(summary.get('updated_at', now), now)
+    counters = summary.get('counters', {})
+    return {
+        "updated_at": now,
+        "counters": {
+            category: {key: value * factor for key, value in counters.get(category, {}).items()}
+            for category in PREFERENCE_CATEGORIES
+        },
+        "folded": dict(summary.get('folded', {}))
+    }
+
+
+def normalize_user_preferences(user_prefs: Dict, now: Optional[float] = None) -> Dict:
+    """Ensure all categories exist and every entry is a timestamped dict"""
+    now = time.time() if now is None else now
+    for category in PREFERENCE_CATEGORIES:
+        entries = [normalize_entry(entry, now) for entry in user_prefs.get(category, [])]
+        user_prefs[category] = [entry for entry in entries if entry]
+    return user_prefs
+
+
+def cap_history(user_prefs: Dict, features_fn: Callable[[str], Dict[str, float]],
+                now: Optional[float] = None, limit: int = MAX_HISTORY_PER_CATEGORY) -> Dict:
+    """Fold the oldest entries beyond `limit` per category into the decayed summary"""
+    now = time.time() if now is None else now
+    overflow = {category: len(user_prefs.get(category, [])) - limit for category in PREFERENCE_CATEGORIES}
+    if all(count <= 0 for count in overflow.values()):
+        return user_prefs
+
+    summary = decay_summary(user_prefs.get('summary'), now)
+    for category, count in overflow.items():
+        if count <= 0:
+            continue
+        entries = sorted(user_prefs[category], key=lambda entry: entry.get('rated_at', now))
+        folded, user_prefs[category] = entries[:count], entries[count:]
+        counters = summary['counters'][category]
+        for entry in folded:
+            weight = decay_weight(entry.get('rated_at'), now)
+            for key, value in features_fn(entry['name']).items():
+                counters[key] = counters.get(key, 0.0) + value * weight
+            summary['folded'][entry['name']] = [category, entry.get('rated_at', now)]
+    user_prefs['summary'] = summary
+    return user_prefs
+
+
+def folded_ratings(user_prefs: Dict) -> Dict[str, str]:
+    """{meal name: category} for ratings folded out of the raw history"""
+    folded = (user_prefs.get('summary') or {}).get('folded', {})
+    return {name: item[0] for name, item in folded.items()}
+
+
+def forget_folded(user_prefs: Dict, meal_name: str, features_fn: Callable[[str], Dict[str, float]],
+                  now: Optional[float] = None) -> Optional[str]:
+    """Drop a folded rating (and its decayed features); returns its category or None"""
+    summary = user_prefs.get('summary')
+    if not summary or meal_name not in summary.get('folded', {}):
+        return None
+    now = time.time() if now is None else now
+    summary = user_prefs['summary'] = decay_summary(summary, now)
+    category, rated_at = summary['folded'].pop(meal_name)
+    counters = summary['counters'][category]
+    weight = decay_weight(rated_at, now)
+    for key, value in features_fn(meal_name).items():
+        remaining = counters.get(key, 0.0) - value * weight
+        if remaining > 1e-9:
+            counters[key] = remaining
+        else:
+            counters.pop(key, None)
+    return category
+
+
+def recent_names(entries: List, limit: int) -> List[str]:
+    """Names of the `limit` most recently rated entries, in rating order (oldest first)
+
+    Entries with equal timestamps (e.g. legacy entries normalized in one pass)
+    keep their list position, where later means newer.
+    """
+    ordered = sorted(range(len(entries)),
+                     key=lambda i: (entries[i].get('rated_at', 0) if isinstance(entries[i], dict) else 0, i))
+    recent = ordered[len(ordered) - limit:] if limit > 0 else []
+    return [name for name in (entry_name(entries[i]) for i in recent) if name]
+
+
+def migrate_preferences_file(filepath: str, features_fn: Callable[[str], Dict[str, float]],
+                             now: Optional[float] = None) -> int:
+    """Timestamp and cap every user's history in place; returns number of users migrated"""
+    now = time.time() if now is None else now
+    with open(filepath, 'r') as file:
+        all_preferences = json.load(file)
+    for user_id, user_prefs in all_preferences.items():
+        all_preferences[user_id] = cap_history(normalize_user_preferences(user_prefs, now), features_fn, now)
+    with open(filepath, 'w') as file:
+        json.dump(all_preferences, file, indent=2)
+    return len(all_preferences)
+
+
+# ===== CLI =====
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print(__doc__)
+        sys.exit(1)
+
+    from chatgpt_service import meal_name_features
+
+    target = sys.argv[2] if len(sys.argv) > 2 else '../data/preferences.json'
+    if not os.path.exists(target):
+        print(f"❌ No preferences file at {target}")
+        sys.exit(1)
+    migrated = migrate_preferences_file(target, meal_name_features)
+    print(f"✅ Migrated preference history for {migrated} users in {target}")
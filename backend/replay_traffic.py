@@ -0,0 +1,252 @@
+"""
+Deterministic replay of recorded API traffic
+
+Drives the requests captured by traffic_capture.py (MEALMATE_CAPTURE=sampled|full)
+against the Flask app in-process, with the LLM replaced by a deterministic stub,
+and reports latency distributions per endpoint so builds can be compared offline.
+
+Replays run against a temporary copy of ../data, so ratings in the capture never
+touch the real preference store. The user store starts with only the accounts
+the capture shows already existed (successful logins, "already exists"
+registrations); redacted passwords are replayed as one fixed placeholder (a wrong
+one for logins recorded as 401), so auth requests take the same success/failure
+path they took when recorded.
+
+Usage:
+    python replay_traffic.py [CAPTURE_FILE] [--speed 1.0] [--llm-latency-ms 0]
+                             [--limit N] [--output results.json] [--json]
+
+--speed 1 replays at the original rate, 10 at ten times that, 0 as fast as possible.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Dict, List
+
+from traffic_capture import DEFAULT_CAPTURE_FILE, REDACTED_FIELDS, REDACTED_VALUE
+
+REPLAY_PASSWORD = 'replay-password'  # Stands in for every redacted password
+CANDIDATE_PATTERN = re.compile(r"^\s*1\. (.+?) \(Compatibility Score", re.MULTILINE)
+
+
+class StubChatCompletion:
+    """Stands in for openai.ChatCompletion: always picks the top-scored candidate"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+
+    def create(self, **kwargs):
+        prompt = kwargs['messages'][-1]['content']
+        match = CANDIDATE_PATTERN.search(prompt)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        content = json.dumps({
+            "name": match.group(1) if match else "",
+            "recommendation_reason": "Replay stub: top compatibility score"
+        })
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def load_capture(filepath: str, limit: int = 0) -> List[Dict]:
+    """Read capture records in timestamp order, skipping malformed lines"""
+    records = []
+    with open(filepath, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entry, dict) and entry.get('endpoint'):
+                records.append(entry)
+    records.sort(key=lambda entry: entry.get('ts', 0))
+    return records[:limit] if limit else records
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def summarize(latencies: Dict[str, List[float]]) -> Dict[str, Dict]:
+    return {
+        key: {
+            "count": len(values),
+            "mean_ms": round(sum(values) / len(values), 3),
+            "p50_ms": round(percentile(values, 50), 3),
+            "p90_ms": round(percentile(values, 90), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+            "max_ms": round(max(values), 3)
+        }
+        for key, values in sorted(latencies.items()) if values
+    }
+
+
+def replay_body(entry: Dict):
+    """Request body to send: redacted secrets become the fixed replay placeholder"""
+    body = entry.get('body')
+    if not isinstance(body, dict):
+        return body
+    # A login that failed when recorded gets a wrong password, so it takes the same path
+    password = REPLAY_PASSWORD + '-rejected' if entry['endpoint'] == '/api/login' and entry.get('status') == 401 \
+        else REPLAY_PASSWORD
+    return {key: (password if key in REDACTED_FIELDS and value == REDACTED_VALUE else value)
+            for key, value in body.items()}
+
+
+def preexisting_users(records: List[Dict]) -> List[Dict]:
+    """Accounts the capture shows existed before it began, with the replay password"""
+    seen, users = set(), []
+    for entry in records:
+        body = entry.get('body') if isinstance(entry.get('body'), dict) else {}
+        email = body.get('email')
+        if not email or email in seen:
+            continue
+        if entry['endpoint'] == '/api/register':
+            seen.add(email)
+            if entry.get('status') != 400 or not body.get('name') or not body.get('password'):
+                continue  # Registered during the capture (or invalid): replay creates it
+        elif entry['endpoint'] == '/api/login':
+            seen.add(email)
+            if entry.get('status') != 200:
+                continue  # Unknown account when recorded: keep it unknown
+        else:
+            continue
+        users.append({"id": len(users) + 1, "name": body.get('name') or email.split('@')[0],
+                      "email": email, "password": REPLAY_PASSWORD, "created_at": "replay"})
+    return users
+
+
+def isolate_data_files(app_module, data_dir: str, users: List[Dict] = None):
+    """Point the app at a scratch copy of the data directory (users replaced when given)"""
+    for name in ('USERS_FILE', 'MEALS_FILE', 'PREFERENCES_FILE', 'MEAL_RATINGS_FILE'):
+        original = getattr(app_module, name)
+        copy_path = os.path.join(data_dir, os.path.basename(original))
+        if name == 'USERS_FILE' and users is not None:
+            with open(copy_path, 'w') as file:
+                json.dump(users, file, indent=2)
+        elif os.path.exists(original):
+            shutil.copy(original, copy_path)
+        setattr(app_module, name, copy_path)
+
+
+def replay(records: List[Dict], speed: float = 1.0, llm_latency_ms: float = 0.0) -> Dict:
+    """Replay records against the app and collect latency/status statistics"""
+    import app as app_module
+    import chatgpt_service
+
+    stub = SimpleNamespace(ChatCompletion=StubChatCompletion(llm_latency_ms))
+    chatgpt_service.get_openai_client = lambda: stub
+
+    flask_app = app_module.app
+    flask_app.config['TRAFFIC_RECORDER'] = None  # Never re-capture replayed traffic
+    client = flask_app.test_client()
+
+    latencies = defaultdict(list)
+    recorded = defaultdict(list)
+    sources = defaultdict(int)
+    statuses = defaultdict(int)
+    status_mismatches = 0
+
+    with tempfile.TemporaryDirectory(prefix='mealmate-replay-') as data_dir:
+        isolate_data_files(app_module, data_dir, preexisting_users(records))
+
+        first_ts = records[0].get('ts', 0) if records else 0
+        started = time.perf_counter()
+        for entry in records:
+            if speed > 0:
+                delay = (entry.get('ts', first_ts) - first_ts) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+
+            endpoint = entry['endpoint']
+            request_start = time.perf_counter()
+            method = entry.get('method', 'POST')
+            response = client.open(endpoint, method=method, query_string=entry.get('query', ''),
+                                   headers=entry.get('headers') or {},
+                                   json=replay_body(entry) if method not in ('GET', 'HEAD') else None)
+            elapsed_ms = (time.perf_counter() - request_start) * 1000
+
+            latencies[endpoint].append(elapsed_ms)
+            if entry.get('duration_ms') is not None:
+                recorded[endpoint].append(entry['duration_ms'])
+            statuses[str(response.status_code)] += 1
+            if entry.get('status') is not None and entry['status'] != response.status_code:
+                status_mismatches += 1
+            source = chatgpt_service.get_last_response_source() if endpoint == '/api/get-recommendation' else None
+            if source:
+                sources[source] += 1
+
+        wall_seconds = time.perf_counter() - started
+
+    return {
+        "requests": len(records),
+        "wall_seconds": round(wall_seconds, 3),
+        "speed": speed,
+        "llm_latency_ms": llm_latency_ms,
+        "replayed": summarize(latencies),
+        "recorded": summarize(recorded),
+        "status_counts": dict(statuses),
+        "status_mismatches": status_mismatches,
+        "response_sources": dict(sources)
+    }
+
+
+def print_results(results: Dict):
+    print(f"🔁 Replayed {results['requests']} requests in {results['wall_seconds']}s "
+          f"(speed x{results['speed']}, stub LLM latency {results['llm_latency_ms']} ms)")
+    for endpoint, stats in results['replayed'].items():
+        original = results['recorded'].get(endpoint)
+        print(f"  {endpoint:<28} n={stats['count']:<6} p50={stats['p50_ms']:>8.2f} "
+              f"p90={stats['p90_ms']:>8.2f} p99={stats['p99_ms']:>8.2f} max={stats['max_ms']:>8.2f} ms")
+        if original:
+            print(f"  {'  (recorded)':<28} n={original['count']:<6} p50={original['p50_ms']:>8.2f} "
+                  f"p90={original['p90_ms']:>8.2f} p99={original['p99_ms']:>8.2f} max={original['max_ms']:>8.2f} ms")
+    print(f"  Status codes: {results['status_counts']} (mismatches vs recording: {results['status_mismatches']})")
+    print(f"  Recommendation sources: {results['response_sources']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded MealMate API traffic")
+    parser.add_argument('capture_file', nargs='?', default=DEFAULT_CAPTURE_FILE)
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Rate multiplier (1 = original rate, 0 = as fast as possible)")
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help="Simulated LLM latency per call")
+    parser.add_argument('--limit', type=int, default=0, help="Replay only the first N requests")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    records = load_capture(args.capture_file, args.limit)
+    if not records:
+        print(f"No recorded requests found in {args.capture_file}")
+        return 1
+
+    results = replay(records, speed=args.speed, llm_latency_ms=args.llm_latency_ms)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
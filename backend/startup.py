@@ -0,0 +1,179 @@
+"""
+Startup state and cold-start reporting for the MealMate backend
+
+The app factory builds the meal catalog (with its name/intern indexes) and the
+compiled keyword matchers exactly once per worker. The result can be written to
+a binary snapshot so later workers skip JSON parsing and interning. A snapshot
+is used only if meals.json still has the same content and the keyword tables
+in chatgpt_service are unchanged.
+
+Usage:
+    python startup.py report [--json]          # cold-start report, phase by phase
+    python startup.py build-snapshot [PATH]    # write a prebuilt startup snapshot
+"""
+
+import json
+import os
+import pickle
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+SNAPSHOT_VERSION = 4
+DEFAULT_SNAPSHOT_FILE = '../data/startup_snapshot.pkl'
+
+
+class StartupReport:
+    """Wall-clock duration of each startup phase, in order"""
+
+    def __init__(self):
+        self.phases: List[Dict] = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append({"phase": name, "ms": round((time.perf_counter() - start) * 1000, 3)})
+
+    def note(self, name: str, value):
+        """Attach a non-timing fact to the report (e.g. where state came from)"""
+        self.phases.append({"phase": name, "value": value})
+
+    @property
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self._started) * 1000, 3)
+
+    def to_dict(self) -> Dict:
+        return {"phases": self.phases, "total_ms": self.total_ms}
+
+    def format(self) -> str:
+        lines = []
+        for entry in self.phases:
+            if "ms" in entry:
+                lines.append(f"  {entry['phase']:<28} {entry['ms']:>9.2f} ms")
+            else:
+                lines.append(f"  {entry['phase']:<28} {entry['value']}")
+        lines.append(f"  {'total':<28} {self.total_ms:>9.2f} ms")
+        return "\n".join(lines)
+
+
+# Module-level report so phases that run at import time (app.py) can be recorded
+STARTUP_REPORT = StartupReport()
+
+
+class StartupState:
+    """Everything a worker precomputes before serving requests"""
+
+    def __init__(self, catalog, keyword_matchers, meals_file: str, meals_mtime: float,
+                 keyword_fingerprint: str):
+        self.catalog = catalog
+        self.keyword_matchers = keyword_matchers
+        self.keyword_fingerprint = keyword_fingerprint  # Hash of the tables the matchers were built from
+        self.meals_file = meals_file
+        self.meals_mtime = meals_mtime
+
+
+def _file_mtime(filepath: str) -> float:
+    try:
+        return os.path.getmtime(filepath)
+    except OSError:
+        return -1.0
+
+
+def build_startup_state(meals_file: str) -> StartupState:
+    """Build the catalog and keyword matchers from source data"""
+    from meal_catalog import load_meal_catalog
+    from chatgpt_service import build_keyword_matchers, keyword_tables_fingerprint
+
+    meals_mtime = _file_mtime(meals_file)
+    return StartupState(load_meal_catalog(meals_file), build_keyword_matchers(), meals_file, meals_mtime,
+                        keyword_tables_fingerprint())
+
+
+def save_snapshot(state: StartupState, snapshot_file: str):
+    """Write the startup state to a binary snapshot file"""
+    os.makedirs(os.path.dirname(snapshot_file) or '.', exist_ok=True)
+    tmp_file = snapshot_file + '.tmp'
+    with open(tmp_file, 'wb') as file:
+        pickle.dump({"version": SNAPSHOT_VERSION, "state": state}, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, snapshot_file)
+
+
+def load_snapshot(snapshot_file: str, meals_file: str) -> Optional[StartupState]:
+    """Load a snapshot if it exists and is still current for meals_file and the keyword tables"""
+    from meal_catalog import file_content_version
+    from chatgpt_service import keyword_tables_fingerprint
+
+    if not snapshot_file or not os.path.exists(snapshot_file):
+        return None
+    try:
+        with open(snapshot_file, 'rb') as file:
+            payload = pickle.load(file)
+    except Exception as e:
+        print(f"Ignoring unreadable startup snapshot {snapshot_file}: {e}")
+        return None
+
+    state = payload.get("state") if payload.get("version") == SNAPSHOT_VERSION else None
+    if state is None or state.keyword_fingerprint != keyword_tables_fingerprint():
+        return None  # From another build or keyword tables edited since - rebuild from source
+    if state.catalog.version != file_content_version(meals_file):
+        return None  # meals.json content changed
+    # Same content; adopt the current mtime (e.g. after a fresh checkout) so the catalog cache accepts it
+    state.meals_mtime = _file_mtime(meals_file)
+    return state
+
+
+def load_startup_state(meals_file: str, snapshot_file: Optional[str] = None,
+                       report: StartupReport = STARTUP_REPORT) -> StartupState:
+    """Load state from the snapshot when possible, otherwise build it"""
+    state = None
+    if snapshot_file:
+        with report.phase("load_snapshot"):
+            state = load_snapshot(snapshot_file, meals_file)
+    if state is not None:
+        report.note("state_source", "snapshot")
+        return state
+
+    with report.phase("build_state"):
+        state = build_startup_state(meals_file)
+    report.note("state_source", "built")
+    return state
+
+
+def install_startup_state(state: StartupState):
+    """Make the precomputed state the one used by the service modules"""
+    from meal_catalog import prime_catalog_cache
+    from chatgpt_service import install_keyword_matchers
+
+    prime_catalog_cache(state.meals_file, state.catalog, state.meals_mtime)
+    install_keyword_matchers(state.keyword_matchers)
+
+
+# ===== CLI =====
+if __name__ == "__main__":
+    # Go through the importable module so app.py shares the same report and
+    # pickled classes resolve to `startup.*` rather than `__main__.*`
+    import startup
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "report"
+
+    if command == "report":
+        with startup.STARTUP_REPORT.phase("import_app"):
+            import app  # noqa: F401 - importing runs the app factory
+        if "--json" in sys.argv:
+            print(json.dumps(startup.STARTUP_REPORT.to_dict(), indent=2))
+        else:
+            print("⏱️  Startup report:")
+            print(startup.STARTUP_REPORT.format())
+    elif command == "build-snapshot":
+        from app import MEALS_FILE
+        target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SNAPSHOT_FILE
+        startup.save_snapshot(startup.build_startup_state(MEALS_FILE), target)
+        print(f"✅ Startup snapshot written to {target}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,128 @@
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+# ===== RECORDED TRAFFIC CAPTURE =====
+# Optionally appends every API request to a JSONL file so production load can be
+# replayed offline (see replay_traffic.py). Request handlers only enqueue a
+# record; a background thread batches the writes, so capture never blocks a
+# response on disk I/O. If the queue is full the record is dropped and counted.
+
+CAPTURE_MODE_OFF = 'off'
+CAPTURE_MODE_SAMPLED = 'sampled'
+CAPTURE_MODE_FULL = 'full'
+
+DEFAULT_CAPTURE_FILE = '../requests.jsonl'
+REDACTED_FIELDS = ('password',)
+REDACTED_VALUE = '***'
+# Request headers that change the response (conditional GET, gzip) and are replayed
+RECORDED_HEADERS = ('If-None-Match', 'If-Modified-Since', 'Accept-Encoding')
+
+
+def redact_body(body):
+    """Strip secrets (passwords) from a request body before it is recorded"""
+    if not isinstance(body, dict):
+        return body
+    return {key: (REDACTED_VALUE if key in REDACTED_FIELDS else value) for key, value in body.items()}
+
+
+def recorded_headers(headers) -> Dict[str, str]:
+    """The subset of request headers that replay needs to reproduce the response"""
+    return {name: headers[name] for name in RECORDED_HEADERS if name in headers}
+
+
+class TrafficRecorder:
+    """Buffered, non-blocking JSONL writer for API request records"""
+
+    def __init__(self, filepath: str = DEFAULT_CAPTURE_FILE, mode: str = CAPTURE_MODE_OFF,
+                 sample_rate: float = 0.1, max_queue: int = 10000,
+                 batch_size: int = 256, flush_interval: float = 1.0):
+        self.filepath = filepath
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_queue)
+        self._random = random.Random()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in (CAPTURE_MODE_SAMPLED, CAPTURE_MODE_FULL)
+
+    def should_record(self) -> bool:
+        if self.mode == CAPTURE_MODE_FULL:
+            return True
+        if self.mode == CAPTURE_MODE_SAMPLED:
+            return self._random.random() < self.sample_rate
+        return False
+
+    def record(self, entry: Dict):
+        """Queue one request record; never blocks the caller"""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(json.dumps(entry, default=str))
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name='traffic-capture', daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                line = self._queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                line = ''
+            if line is None:  # Shutdown sentinel
+                self._write(batch)
+                return
+            if line:
+                batch.append(line)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.filepath) or '.', exist_ok=True)
+            with open(self.filepath, 'a') as file:
+                file.write('\n'.join(batch) + '\n')
+        except OSError as e:
+            print(f"Traffic capture write failed: {e}")
+
+    def close(self):
+        """Flush pending records and stop the writer thread"""
+        writer = self._writer
+        if writer is None:
+            return
+        self._queue.put(None)
+        writer.join(timeout=5)
+        self._writer = None
+
+
+def recorder_from_env() -> TrafficRecorder:
+    """Configure capture from MEALMATE_CAPTURE (off|sampled|full) and friends"""
+    return TrafficRecorder(
+        filepath=os.getenv('MEALMATE_CAPTURE_FILE', DEFAULT_CAPTURE_FILE),
+        mode=os.getenv('MEALMATE_CAPTURE', CAPTURE_MODE_OFF).lower(),
+        sample_rate=float(os.getenv('MEALMATE_CAPTURE_SAMPLE_RATE', '0.1'))
+    )